@@ -1,16 +1,27 @@
 import datetime
-import requests
 import os
 import argparse
+import csv
+import itertools
+import sys
 import re
+import array
+import bisect
+import mmap
+import struct
 import json
-from dateutil.easter import easter
-from dateutil.relativedelta import relativedelta as rd, FR
-from holidays.constants import JAN, MAY, AUG, OCT, NOV, DEC
-from holidays.holiday_base import HolidayBase
+import time
+import threading
+from collections import OrderedDict, namedtuple
+# PicoPlaca usa el nombre time para la hora del vehículo
+from time import perf_counter as _perf_counter
 
+# Las dependencias pesadas (holidays, dateutil, requests, asyncio, numpy, etc.) se importan
+# solo cuando se ejecuta el código que las necesita, para que una consulta fuera de línea
+# desde la línea de comandos arranque rápido.
 
-class HolidayEcuador(HolidayBase):
+
+class _HolidayEcuadorRules:
     """
     Una clase para representar un feriado en Ecuador por provincia (HolidayEcuador)
     Su objetivo es determinar si un
@@ -26,12 +37,34 @@ class HolidayEcuador(HolidayBase):
     __init__(self, plate, date, time, online=False):
         Construye todos los atributos necesarios para el objeto HolidayEcuador.
     _poblar(uno mismo, año):
-        Devoluciones si una fecha es feriado o no
+        Agrega al calendario los feriados del año
+    add_year(self, year) / remove_year(self, year):
+        Agrega o quita un año sin recalcular los demás
+    year_holidays(cls, year, prov):
+        Devuelve los feriados nacionales más los locales de la provincia en un año
+    national_holidays(cls, year) / provincial_holidays(cls, year, prov):
+        Devuelven los feriados nacionales o solo los locales, calculados una sola vez por proceso
+    invalidate(cls, years=None, provinces=None):
+        Descarta los feriados ya calculados
     """
     # Códigos ISO 3166-2 para las principales subdivisiones,
     # provincias llamadas
     # https://es.wikipedia.org/wiki/ISO_3166-2:EC
-    PROVINCES = ["EC-P"]  # TODO add more provinces
+    # Feriados locales de cada provincia como (mes, día, nombre); se suman a los nacionales
+    # y se trasladan con las mismas reglas que el día del trabajo
+    PROVINCIAL_HOLIDAYS = {
+        # Pichincha
+        "EC-P": ((12, 6, "Fundación de Quito [Foundation of Quito]"),),
+        # Guayas
+        "EC-G": ((7, 25, "Fundación de Guayaquil [Foundation of Guayaquil]"),),
+        # Azuay
+        "EC-A": ((4, 12, "Fundación de Cuenca [Foundation of Cuenca]"),)}
+    PROVINCES = list(PROVINCIAL_HOLIDAYS)
+
+    # Feriados ya calculados por (año, provincia), compartidos por todas las instancias;
+    # los nacionales se guardan una sola vez por año con la provincia None
+    _year_rules = {}
+    _year_rules_lock = threading.Lock()
 
     def __init__(self, **kwargs):
         """
@@ -39,85 +72,202 @@ class HolidayEcuador(HolidayBase):
         """         
         self.country = "ECU"
         self.prov = kwargs.pop("prov", "ON")
-        HolidayBase.__init__(self, **kwargs)
+        super().__init__(**kwargs)
 
     def _populate(self, year):
         """
-        Comprueba si una fecha es feriado o no
+        Agrega al calendario los feriados del año
         
         Parámetros
         ----------
-        año: str
+        año: int
             año de una fecha
-        Returns
-        -------
-        Devuelve verdadero si una fecha es un día festivo, de lo contrario, se muestra como verdadero.
         """                    
+        for day, name in self.year_holidays(year, self.prov):
+            self[day] = name
+
+    def add_year(self, year):
+        """
+        Agrega un año al calendario sin recalcular los demás
+
+        Parámetros
+        ----------
+        year: int
+            año que se agrega
+        """
+        if year not in self.years:
+            self.years.add(year)
+            self._populate(year)
+
+    def remove_year(self, year):
+        """
+        Quita un año del calendario sin recalcular los demás
+
+        Parámetros
+        ----------
+        year: int
+            año que se quita
+        """
+        for day in [day for day in self if day.year == year]:
+            dict.__delitem__(self, day)
+        self.years.discard(year)
+
+    @classmethod
+    def year_holidays(cls, year, prov):
+        """
+        Devuelve los feriados de un año y provincia: los nacionales más los locales
+
+        Parámetros
+        ----------
+        year: int
+            año que se consulta
+        prov: str
+            código de provincia según ISO3166-2
+        Devoluciones
+        -------
+        Una tupla de pares (datetime.date, nombre) en el orden en que se agregan al calendario
+        """
+        return cls.national_holidays(year) + cls.provincial_holidays(year, prov)
+
+    @classmethod
+    def national_holidays(cls, year):
+        """
+        Devuelve los feriados nacionales de un año, calculándolos solo la primera vez
+
+        Parámetros
+        ----------
+        year: int
+            año que se consulta
+        Devoluciones
+        -------
+        Una tupla de pares (datetime.date, nombre)
+        """
+        holidays = cls._year_rules.get((year, None))
+        if holidays is None:
+            holidays = tuple(cls._compute_national(year))
+            with cls._year_rules_lock:
+                cls._year_rules[(year, None)] = holidays
+        return holidays
+
+    @classmethod
+    def provincial_holidays(cls, year, prov):
+        """
+        Devuelve solo los feriados locales de una provincia en un año (vacío si no tiene)
+
+        Parámetros
+        ----------
+        year: int
+            año que se consulta
+        prov: str
+            código de provincia según ISO3166-2
+        Devoluciones
+        -------
+        Una tupla de pares (datetime.date, nombre)
+        """
+        holidays = cls._year_rules.get((year, prov))
+        if holidays is None:
+            holidays = tuple(
+                (cls._losep_transfer(datetime.date(year, month, day)), name)
+                for month, day, name in cls.PROVINCIAL_HOLIDAYS.get(prov, ()))
+            with cls._year_rules_lock:
+                cls._year_rules[(year, prov)] = holidays
+        return holidays
+
+    @classmethod
+    def invalidate(cls, years=None, provinces=None):
+        """
+        Descarta los feriados ya calculados (por ejemplo, si cambian las reglas de traslado de la LOSEP)
+
+        Parámetros
+        ----------
+        years: iterable de int, opcional
+            años que se descartan (el valor predeterminado es None: todos)
+        provinces: iterable de str, opcional
+            provincias cuyos feriados locales se descartan; los nacionales solo se descartan
+            si no se indican provincias (el valor predeterminado es None: todas)
+        """
+        years = None if years is None else set(years)
+        provinces = None if provinces is None else set(provinces)
+        with cls._year_rules_lock:
+            for year, prov in list(cls._year_rules):
+                if (years is None or year in years) and (provinces is None or prov in provinces):
+                    del cls._year_rules[(year, prov)]
+
+    @staticmethod
+    def _losep_transfer(day):
+        """
+        Traslada un feriado según la Ley 858/Ley de Reforma a la LOSEP (vigente desde el
+        21 de diciembre de 2016 /R.O # 906); antes de 2016 el feriado no se traslada
+
+        Parámetros
+        ----------
+        day: datetime.date
+            fecha original del feriado
+        Devoluciones
+        -------
+        La fecha en que se descansa
+        """
+        if day.year <= 2015:
+            return day
+        weekday = day.weekday()
+        # Si el feriado cae en sábado o martes
+        # El descanso obligatorio irá al viernes o lunes inmediato anterior
+        if weekday in (5, 1):
+            return day - datetime.timedelta(days=1)
+        # Si el feriado cae en domingo
+        # El descanso obligatorio irá al lunes siguiente
+        if weekday == 6:
+            return day + datetime.timedelta(days=1)
+        # Feriados que sean en miércoles o jueves
+        # Se trasladará al viernes de esa semana
+        if weekday in (2, 3):
+            return day + datetime.timedelta(days=4 - weekday)
+        return day
+
+    @classmethod
+    def _compute_national(cls, year):
+        """
+        Calcula los feriados nacionales de un año
+        
+        Parámetros
+        ----------
+        year: int
+            año que se calcula
+        Devoluciones
+        -------
+        Genera pares (datetime.date, nombre)
+        """
+        from dateutil.easter import easter
+
+        # Las fiestas móviles dependen solo del domingo de Pascua, que se calcula una vez
+        easter_day = easter(year)
+
         # Año nuevo
-        self[datetime.date(year, JAN, 1)] = "Año Nuevo [New Year's Day]"
+        yield datetime.date(year, 1, 1), "Año Nuevo [New Year's Day]"
         
         # Navidad
-        self[datetime.date(year, DEC, 25)] = "Navidad [Christmas]"
+        yield datetime.date(year, 12, 25), "Navidad [Christmas]"
         
         # Semana Santa
-        self[easter(year) + rd(weekday=FR(-1))] = "Semana Santa (Viernes Santo) [Good Friday)]"
-        self[easter(year)] = "Día de Pascuas [Easter Day]"
+        yield easter_day - datetime.timedelta(days=2), "Semana Santa (Viernes Santo) [Good Friday)]"
+        yield easter_day, "Día de Pascuas [Easter Day]"
         
         # Carnaval
         total_lent_days = 46
-        self[easter(year) - datetime.timedelta(days=total_lent_days+2)] = "Lunes de carnaval [Carnival of Monday)]"
-        self[easter(year) - datetime.timedelta(days=total_lent_days+1)] = "Martes de carnaval [Tuesday of Carnival)]"
+        yield easter_day - datetime.timedelta(days=total_lent_days+2), "Lunes de carnaval [Carnival of Monday)]"
+        yield easter_day - datetime.timedelta(days=total_lent_days+1), "Martes de carnaval [Tuesday of Carnival)]"
         
         # Día del trabajo
-        name = "Día Nacional del Trabajo [Labour Day]"
-        #(Ley 858/Ley de Reforma a la LOSEP (vigente desde el 21 de diciembre de 2016 /R.O # 906)) Si el feriado cae en sábado o martes
-        # El descanso obligatorio irá al viernes o lunes inmediato anterior
-        # Respectivamente
-        if year > 2015 and datetime.date(year, MAY, 1).weekday() in (5,1):
-            self[datetime.date(year, MAY, 1) - datetime.timedelta(days=1)] = name
-        # (Ley 858/Ley de Reforma a la LOSEP (vigente desde el 21 de diciembre de 2016/R.O # 906)) si el feriado cae en domingo
-        # El descanso obligatorio irá al lunes siguiente
-        elif year > 2015 and datetime.date(year, MAY, 1).weekday() == 6:
-            self[datetime.date(year, MAY, 1) + datetime.timedelta(days=1)] = name
-        # (Ley 858/Ley de Reforma a la LOSEP (vigente desde el 21 de diciembre de 2016 /R.O # 906)) Feriados que sean en miércoles o jueves
-        # Se trasladará al viernes de esa semana
-        elif year > 2015 and  datetime.date(year, MAY, 1).weekday() in (2,3):
-            self[datetime.date(year, MAY, 1) + rd(weekday=FR)] = name
-        else:
-            self[datetime.date(year, MAY, 1)] = name
+        yield cls._losep_transfer(datetime.date(year, 5, 1)), "Día Nacional del Trabajo [Labour Day]"
         
         # Batalla de Pichincha, las reglas son las mismas que el día del trabajo
-        name = "Batalla del Pichincha [Pichincha Battle]"
-        if year > 2015 and datetime.date(year, MAY, 24).weekday() in (5,1):
-            self[datetime.date(year, MAY, 24).weekday() - datetime.timedelta(days=1)] = name
-        elif year > 2015 and datetime.date(year, MAY, 24).weekday() == 6:
-            self[datetime.date(year, MAY, 24) + datetime.timedelta(days=1)] = name
-        elif year > 2015 and  datetime.date(year, MAY, 24).weekday() in (2,3):
-            self[datetime.date(year, MAY, 24) + rd(weekday=FR)] = name
-        else:
-            self[datetime.date(year, MAY, 24)] = name        
+        yield cls._losep_transfer(datetime.date(year, 5, 24)), "Batalla del Pichincha [Pichincha Battle]"
         
         # Primer Grito de Independencia, las reglas son las mismas que el día del trabajo
-        name = "Primer Grito de la Independencia [First Cry of Independence]"
-        if year > 2015 and datetime.date(year, AUG, 10).weekday() in (5,1):
-            self[datetime.date(year, AUG, 10)- datetime.timedelta(days=1)] = name
-        elif year > 2015 and datetime.date(year, AUG, 10).weekday() == 6:
-            self[datetime.date(year, AUG, 10) + datetime.timedelta(days=1)] = name
-        elif year > 2015 and  datetime.date(year, AUG, 10).weekday() in (2,3):
-            self[datetime.date(year, AUG, 10) + rd(weekday=FR)] = name
-        else:
-            self[datetime.date(year, AUG, 10)] = name       
+        yield cls._losep_transfer(datetime.date(year, 8, 10)), "Primer Grito de la Independencia [First Cry of Independence]"
         
         #Independencia de Guayaquil, las reglas son las mismas que el día del trabajo
-        name = "Independencia de Guayaquil [Guayaquil's Independence]"
-        if year > 2015 and datetime.date(year, OCT, 9).weekday() in (5,1):
-            self[datetime.date(year, OCT, 9) - datetime.timedelta(days=1)] = name
-        elif year > 2015 and datetime.date(year, OCT, 9).weekday() == 6:
-            self[datetime.date(year, OCT, 9) + datetime.timedelta(days=1)] = name
-        elif year > 2015 and  datetime.date(year, MAY, 1).weekday() in (2,3):
-            self[datetime.date(year, OCT, 9) + rd(weekday=FR)] = name
-        else:
-            self[datetime.date(year, OCT, 9)] = name        
+        yield cls._losep_transfer(datetime.date(year, 10, 9)), "Independencia de Guayaquil [Guayaquil's Independence]"
         
         # Día de Muertos 
         namedd = "Día de los difuntos [Day of the Dead]" 
@@ -126,317 +276,3102 @@ class HolidayEcuador(HolidayBase):
         #(Ley 858/Ley de Reforma a la LOSEP (vigente desde el 21 de diciembre de 2016 /R.O # 906)) 
         #Para festivos nacionales y/o locales que coincidan en días corridos,
         #Se aplicarán las siguientes reglas:
-        if (datetime.date(year, NOV, 2).weekday() == 5 and  datetime.date(year, NOV, 3).weekday() == 6):
-            self[datetime.date(year, NOV, 2) - datetime.timedelta(days=1)] = namedd
-            self[datetime.date(year, NOV, 3) + datetime.timedelta(days=1)] = nameic     
-        elif (datetime.date(year, NOV, 3).weekday() == 2):
-            self[datetime.date(year, NOV, 2)] = namedd
-            self[datetime.date(year, NOV, 3) - datetime.timedelta(days=2)] = nameic
-        elif (datetime.date(year, NOV, 3).weekday() == 3):
-            self[datetime.date(year, NOV, 3)] = nameic
-            self[datetime.date(year, NOV, 2) + datetime.timedelta(days=2)] = namedd
-        elif (datetime.date(year, NOV, 3).weekday() == 5):
-            self[datetime.date(year, NOV, 2)] =  namedd
-            self[datetime.date(year, NOV, 3) - datetime.timedelta(days=2)] = nameic
-        elif (datetime.date(year, NOV, 3).weekday() == 0):
-            self[datetime.date(year, NOV, 3)] = nameic
-            self[datetime.date(year, NOV, 2) + datetime.timedelta(days=2)] = namedd
+        nov2 = datetime.date(year, 11, 2)
+        nov3 = datetime.date(year, 11, 3)
+        if (nov2.weekday() == 5 and nov3.weekday() == 6):
+            yield nov2 - datetime.timedelta(days=1), namedd
+            yield nov3 + datetime.timedelta(days=1), nameic
+        elif (nov3.weekday() == 2):
+            yield nov2, namedd
+            yield nov3 - datetime.timedelta(days=2), nameic
+        elif (nov3.weekday() == 3):
+            yield nov3, nameic
+            yield nov2 + datetime.timedelta(days=2), namedd
+        elif (nov3.weekday() == 5):
+            yield nov2, namedd
+            yield nov3 - datetime.timedelta(days=2), nameic
+        elif (nov3.weekday() == 0):
+            yield nov3, nameic
+            yield nov2 + datetime.timedelta(days=2), namedd
         else:
-            self[datetime.date(year, NOV, 2)] = namedd
-            self[datetime.date(year, NOV, 3)] = nameic  
-            
-        # Fundación de Quito, aplica solo para la provincia de Pichincha,
-        # Las reglas son las mismas que el día del trabajo
-        name = "Fundación de Quito [Foundation of Quito]"        
-        if self.prov in ("EC-P"):
-            if year > 2015 and datetime.date(year, DEC, 6).weekday() in (5,1):
-                self[datetime.date(year, DEC, 6) - datetime.timedelta(days=1)] = name
-            elif year > 2015 and datetime.date(year, DEC, 6).weekday() == 6:
-                self[(datetime.date(year, DEC, 6).weekday()) + datetime.timedelta(days=1)] =name
-            elif year > 2015 and  datetime.date(year, DEC, 6).weekday() in (2,3):
-                self[datetime.date(year, DEC, 6) + rd(weekday=FR)] = name
-            else:
-                self[datetime.date(year, DEC, 6)] = name
+            yield nov2, namedd
+            yield nov3, nameic
 
-class PicoPlaca:
+_holiday_ecuador_lock = threading.Lock()
+
+
+def _holiday_ecuador_class():
     """
-    Una clase para representar un vehículo.
-    medida de restricción (Pico y Placa)
-    - ORDENANZA METROPOLITANA N° 0305
-    http://www7.quito.gob.ec/mdmq_ordenanzas/Ordenanzas/ORDENANZAS%20A%C3%91OS%20ANTERIORES/ORDM-305-%20%20CIRCULACION%20VEHICULAR%20PICO%20Y%20PLACA.pdf
+    Devuelve la clase HolidayEcuador (reglas de _HolidayEcuadorRules sobre holidays.HolidayBase);
+    la primera vez importa holidays y define la clase
+    """
+    with _holiday_ecuador_lock:
+        cls = globals().get('HolidayEcuador')
+        if cls is None:
+            from holidays.holiday_base import HolidayBase
+            cls = type('HolidayEcuador', (_HolidayEcuadorRules, HolidayBase), {
+                '__module__': __name__,
+                '__doc__': _HolidayEcuadorRules.__doc__})
+            globals()['HolidayEcuador'] = cls
+        return cls
+
+
+def __getattr__(name):
+    """Define HolidayEcuador al primer acceso desde fuera del módulo (PEP 562)"""
+    if name == 'HolidayEcuador':
+        return _holiday_ecuador_class()
+    raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+
+
+class HolidaySnapshot:
+    """
+    Una instantánea binaria de feriados precalculados (HolidaySnapshot)
+    Guarda los feriados nacionales de un rango de años y, para cada provincia, solo sus
+    feriados locales, como días ordinales (datetime.date.toordinal) ordenados en arreglos
+    de enteros de 32 bits, de modo que cargarla no requiere ningún cálculo de dateutil y
+    consultar una fecha es una búsqueda binaria.
     ...
-    Atributos
+    Formato del archivo (little-endian)
     ----------
-    placa : calle
-        El registro o patente de un vehículo es una combinación de caracteres alfabéticos o numéricos
-        caracteres que identifican e individualizan el vehículo respecto de los demás;
-        
-        El formato utilizado es
-        XX-AAAA o XXX-AAAA,
-        donde X es una letra mayúscula e Y es un dígito.
-    fecha: calle
-        Fecha en que el vehiculo pretende transitar
-        esta siguiendo el
-        Formato ISO 8601 AAAA-MM-DD: por ejemplo, 2020-04-22.
-    tiempo: calle
-        tiempo en que el vehiculo pretende transitar
-        esta siguiendo el formato
-        HH:MM: por ejemplo, 08:35, 19:30
-    en línea: booleano, opcional
-        si en línea == Verdadero, se aseguró la API de días festivos abstractos
+    cabecera: b'PYPH', versión (uint16), número de secciones (uint16)
+    por sección: código ISO de la provincia, vacío para la nacional (8 bytes), primer año
+    (uint16), último año (uint16), número de feriados (uint32) y luego los días ordinales (int32)
     Métodos
     -------
-    __init__(self, plate, date, time, online=False):
-        Construye todos los atributos necesarios.
-        para el objeto PicoPlaca.
-    plato (uno mismo):
-        Obtiene el valor del atributo de placa
-    placa (auto, valor):
-        Establece el valor del atributo de la placa
-    fecha (uno mismo):
-        Obtiene el valor del atributo de fecha
-    fecha (auto, valor):
-        Establece el valor del atributo de fecha
-    tiempo (uno mismo):
-        Obtiene el valor del atributo de tiempo
-    tiempo (uno mismo, valor):
-        Establece el valor del atributo de tiempo
-    __find_day(yo, fecha):
-        Devuelve el día a partir de la fecha: por ejemplo, miércoles
-    __is_forbidden_time(self, check_time):
-        Devuelve True si el tiempo proporcionado está dentro de las horas pico prohibidas, de lo contrario, False
-    __es_vacaciones:
-        Devuelve True si la fecha marcada (en formato ISO 8601 AAAA-MM-DD) es un día festivo en Ecuador, de lo contrario, False
-    predecir (automático):
-        Devuelve True si el vehículo con la placa especificada puede estar en la carretera en la fecha y hora especificadas, de lo contrario, False
+    build(cls, first_year, last_year, provinces=None):
+        Calcula los feriados del rango de años para las provincias indicadas
+    save(self, path):
+        Guarda la instantánea en un archivo
+    load(cls, path):
+        Carga una instantánea con mmap, sin copiar los datos
+    covers(self, prov, year):
+        Devuelve True si la instantánea contiene el año de la provincia
+    is_holiday(self, ordinal, prov="EC-P"):
+        Devuelve True si el día ordinal es feriado nacional o local en la provincia
+    holidays(self, prov, year):
+        Devuelve el conjunto de feriados del año en formato AAAA-MM-DD
+    national_holidays(self, year) / provincial_holidays(self, prov, year):
+        Devuelven solo los feriados nacionales o solo los locales del año
     """
-    #Días de la semana 
-    __days = [
-            "Monday",
-            "Tuesday",
-            "Wednesday",
-            "Thursday",
-            "Friday",
-            "Saturday",
-            "Sunday"]
-
-    # Diccionario que contiene las restricciones de la forma {día: último dígito prohibido}
-    __restrictions = {
-            "Monday": [1, 2],
-            "Tuesday": [3, 4],
-            "Wednesday": [5, 6],
-            "Thursday": [7, 8],
-            "Friday": [9, 0],
-            "Saturday": [],
-            "Sunday": []}
+    MAGIC = b'PYPH'
+    VERSION = 2
+    NATIONAL = ''
+    _HEADER = struct.Struct('<4sHH')
+    _SECTION = struct.Struct('<8sHHI')
 
-    def __init__(self, plate, date, time, online=False):
+    def __init__(self, sections, buffer=None):
         """
-        Construye todos los atributos necesarios para el objeto PicoPlaca.
-        
+        Construye todos los atributos necesarios para el objeto HolidaySnapshot.
+
         Parámetros
         ----------
-            placa : calle
-                El registro o patente de un vehículo es una combinación de caracteres alfabéticos o numéricos
-                caracteres que identifican e individualizan el vehículo respecto de los demás;
-                El formato utilizado es AA-YYYY o XXX-YYYY, donde X es una letra mayúscula e Y es un dígito.
-            fecha: calle
-                Fecha en la que el vehículo pretende transitar
-                Sigue el formato ISO 8601 AAAA-MM-DD: por ejemplo, 2020-04-22.
-            tiempo: calle
-                tiempo en que el vehículo pretende transitar
-                Sigue el formato HH:MM: por ejemplo, 08:35, 19:30
-            en línea: booleano, opcional
-                si en línea == Verdadero, se usará la API de días festivos abstractos (el valor predeterminado es Falso)
-        """                
-        self.plate = plate
-        self.date = date
-        self.time = time
-        self.online = online
-
-
-    @property
-    def plate(self):
-        """Obtiene el valor del atributo de placa"""
-        return self._plate
-
+        sections: dict
+            {provincia o NATIONAL: (primer año, último año, secuencia ordenada de días ordinales)}
+        buffer: mmap, opcional
+            archivo mapeado en memoria del que provienen las secuencias
+        """
+        self._sections = sections
+        self._buffer = buffer
 
-    @plate.setter
-    def plate(self, value):
+    @classmethod
+    def build(cls, first_year, last_year, provinces=None):
         """
-        Establece el valor del atributo de la placa
+        Calcula los feriados de un rango de años para varias provincias
+
         Parámetros
         ----------
-        valor: cadena
-        
-        aumenta
-        ------
-        ValorError
-            Si la cadena de valor no tiene el formato
-            XX-YYYY o XXX-YYYY,
-            donde X es una letra mayúscula e Y es un dígito
+        first_year: int
+            primer año del rango
+        last_year: int
+            último año del rango (incluido)
+        provinces: lista de str, opcional
+            códigos de provincia (el valor predeterminado es HolidayEcuador.PROVINCES)
+        Devoluciones
+        -------
+        Un objeto HolidaySnapshot
         """
-        if not re.match('^[A-Z]{2,3}-[0-9]{4}$', value):
-            raise ValueError(
-                'La placa debe tener el siguiente formato: XX-YYYY o XXX-YYYY, donde X es una letra mayúscula e Y es un dígito')
-        self._plate = value
-
+        if not 1 <= first_year <= last_year <= 9999:
+            raise ValueError('El rango de años no es válido: {}-{}'.format(first_year, last_year))
+        years = range(first_year, last_year + 1)
+        sections = {cls.NATIONAL: (first_year, last_year, array.array('i', sorted(
+            day.toordinal() for year in years for day, _ in _HolidayEcuadorRules.national_holidays(year))))}
+        for prov in provinces or _HolidayEcuadorRules.PROVINCES:
+            sections[prov] = (first_year, last_year, array.array('i', sorted(
+                day.toordinal() for year in years for day, _ in _HolidayEcuadorRules.provincial_holidays(year, prov))))
+        return cls(sections)
 
-    @property
-    def date(self):
-        """Obtiene el valor del atributo de fecha"""
-        return self._date
+    def save(self, path):
+        """
+        Guarda la instantánea en un archivo binario
 
+        Parámetros
+        ----------
+        path: str
+            ruta del archivo
+        """
+        with open(path, 'wb') as snapshot_file:
+            snapshot_file.write(self._HEADER.pack(self.MAGIC, self.VERSION, len(self._sections)))
+            for prov, (first_year, last_year, ordinals) in self._sections.items():
+                ordinals = array.array('i', ordinals)
+                if sys.byteorder == 'big':
+                    ordinals.byteswap()
+                snapshot_file.write(self._SECTION.pack(prov.encode('ascii'), first_year, last_year, len(ordinals)))
+                snapshot_file.write(ordinals.tobytes())
 
-    @date.setter
-    def date(self, value):
+    @classmethod
+    def load(cls, path):
         """
-        Establece el valor del atributo de fecha
+        Carga una instantánea guardada con save(); en sistemas little-endian los
+        días ordinales se leen directamente del archivo mapeado en memoria
+
         Parámetros
         ----------
-        valor: cadena
-        
+        path: str
+            ruta del archivo
+        Devoluciones
+        -------
+        Un objeto HolidaySnapshot
+
         aumenta
         ------
         ValorError
-            Si la cadena de valor no tiene el formato AAAA-MM-DD (por ejemplo, 2021-04-02)
+            Si el archivo no es una instantánea válida
         """
         try:
-            if len(value) != 10:
+            with open(path, 'rb') as snapshot_file:
+                buffer = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+            view = memoryview(buffer)
+            magic, version, count = cls._HEADER.unpack_from(view, 0)
+            if magic != cls.MAGIC or version != cls.VERSION:
                 raise ValueError
-            datetime.datetime.strptime(value, "%Y-%m-%d")
-        except ValueError:
-            raise ValueError(
-                'La fecha debe tener el siguiente formato: AAAA-MM-DD (por ejemplo: 2021-04-02)') from None
-        self._date = value
-        
+            offset = cls._HEADER.size
+            sections = {}
+            for _ in range(count):
+                prov, first_year, last_year, length = cls._SECTION.unpack_from(view, offset)
+                offset += cls._SECTION.size
+                if offset + 4 * length > len(view):
+                    raise ValueError
+                if sys.byteorder == 'little':
+                    ordinals = view[offset:offset + 4 * length].cast('i')
+                else:
+                    ordinals = array.array('i', view[offset:offset + 4 * length])
+                    ordinals.byteswap()
+                sections[prov.rstrip(b'\0').decode('ascii')] = (first_year, last_year, ordinals)
+                offset += 4 * length
+        except (ValueError, struct.error):
+            raise ValueError('{} no es una instantánea de feriados válida'.format(path)) from None
+        return cls(sections, buffer)
 
-    @property
-    def time(self):
-        """Obtiene el valor del atributo de tiempo"""
-        return self._time
+    def covers(self, prov, year):
+        """Devuelve True si la instantánea contiene el año de la provincia (o nacional, con NATIONAL)"""
+        section = self._sections.get(prov)
+        return section is not None and section[0] <= year <= section[1]
 
+    def _contains(self, prov, ordinal):
+        """Búsqueda binaria de un día ordinal en la sección de la provincia"""
+        ordinals = self._sections[prov][2]
+        index = bisect.bisect_left(ordinals, ordinal)
+        return index < len(ordinals) and ordinals[index] == ordinal
 
-    @time.setter
-    def time(self, value):
+    def _year_dates(self, prov, year):
+        """Devuelve los feriados de una sección en un año como frozenset AAAA-MM-DD"""
+        ordinals = self._sections[prov][2]
+        start = bisect.bisect_left(ordinals, datetime.date(year, 1, 1).toordinal())
+        end = bisect.bisect_right(ordinals, datetime.date(year, 12, 31).toordinal())
+        return frozenset(datetime.date.fromordinal(ordinals[i]).isoformat() for i in range(start, end))
+
+    def is_holiday(self, ordinal, prov="EC-P"):
         """
-        Establece el valor del atributo de tiempo
+        Comprueba si un día ordinal es feriado en la provincia
+
         Parámetros
         ----------
-        valor: cadena
-        
+        ordinal: int
+            día ordinal, por ejemplo datetime.date(2020, 4, 22).toordinal()
+        prov: str, opcional
+            código de provincia según ISO3166-2 (el valor predeterminado es "EC-P")
+        Devoluciones
+        -------
+        Devuelve True si el día es feriado, de lo contrario, False
+
         aumenta
         ------
-        ValorError
-            Si la cadena de valor no tiene el formato HH:MM (por ejemplo, 08:31, 14:22, 00:01)
+        KeyError
+            Si la instantánea no contiene la provincia o el año del día
         """
-        if not re.match('^([01][0-9]|2[0-3]):([0-5][0-9]|)$', value):
-            raise ValueError(
-                'The time must be in the following format: HH:MM (e.g., 08:31, 14:22, 00:01)')
-        self._time = value
+        year = datetime.date.fromordinal(ordinal).year
+        if not (self.covers(self.NATIONAL, year) and self.covers(prov, year)):
+            raise KeyError((prov, year))
+        return self._contains(self.NATIONAL, ordinal) or self._contains(prov, ordinal)
 
-
-    def __find_day(self, date):
+    def holidays(self, prov, year):
         """
-        Encuentra el día a partir de la fecha: por ejemplo, miércoles
+        Devuelve el conjunto de feriados de la provincia en el año indicado
+
         Parámetros
         ----------
-        fecha: calle
-            Está siguiendo el formato ISO 8601 AAAA-MM-DD: por ejemplo, 2020-04-22
+        prov: str
+            código de provincia según ISO3166-2
+        year: int
+            año que se consulta
         Devoluciones
         -------
-        Devuelve el día a partir de la fecha como una cadena
-        """        
-        d = datetime.datetime.strptime(date, '%Y-%m-%d').weekday()
-        return self.__days[d]
+        Un frozenset con las fechas festivas en formato AAAA-MM-DD
 
-
-    def __is_forbidden_time(self, check_time):
+        aumenta
+        ------
+        KeyError
+            Si la instantánea no contiene la provincia o el año
         """
-        Comprueba si el tiempo proporcionado está dentro de las horas pico prohibidas,
-        donde las horas pico son: 07:00 - 09:30 y 16:00 - 19:30
-        Parámetros
-        ----------
-        check_time : str
-            Tiempo que se comprobará. Está en formato HH:MM: por ejemplo, 08:35, 19:15
-        Devoluciones
-        -------
-        Devuelve True si el tiempo proporcionado está dentro de las horas pico prohibidas, de lo contrario, False
-        """           
-        t = datetime.datetime.strptime(check_time, '%H:%M').time()
-        return ((t >= datetime.time(7, 0) and t <= datetime.time(9, 30)) or
-                (t >= datetime.time(16, 0) and t <= datetime.time(19, 30)))
+        if not self.covers(prov, year):
+            raise KeyError((prov, year))
+        if prov == self.NATIONAL:
+            return self._year_dates(prov, year)
+        if not self.covers(self.NATIONAL, year):
+            raise KeyError((self.NATIONAL, year))
+        return self._year_dates(self.NATIONAL, year) | self._year_dates(prov, year)
+
+    def national_holidays(self, year):
+        """Devuelve los feriados nacionales del año (frozenset AAAA-MM-DD); KeyError si no los contiene"""
+        if not self.covers(self.NATIONAL, year):
+            raise KeyError((self.NATIONAL, year))
+        return self._year_dates(self.NATIONAL, year)
+
+    def provincial_holidays(self, prov, year):
+        """Devuelve solo los feriados locales de la provincia en el año (frozenset AAAA-MM-DD); KeyError si no los contiene"""
+        if not self.covers(prov, year):
+            raise KeyError((prov, year))
+        return self._year_dates(prov, year)
+
 
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+
+class HolidayCalendarCache:
+    """
+    Una caché de calendarios de feriados compartida por todo el proceso (HolidayCalendarCache)
+    Guarda, por año, el conjunto de feriados nacionales y, por cada par (provincia, año),
+    solo los feriados locales de la provincia, en formato ISO 8601 AAAA-MM-DD. Una consulta
+    fuera de línea es la búsqueda en el conjunto nacional o en el local de la provincia.
+    ...
+    Atributos
+    ----------
+    maxsize: int
+        número máximo de conjuntos (nacional o provincia, año) que se conservan; al superarlo se
+        descarta el menos usado recientemente (LRU)
+    snapshot: HolidaySnapshot
+        instantánea precalculada que se usa, si contiene el año, en lugar de calcular las reglas
+    hits: int
+        número de consultas resueltas desde la caché
+    misses: int
+        número de consultas que obligaron a construir el calendario del año
+    Métodos
+    -------
+    holidays(self, prov, year):
+        Devuelve el conjunto de feriados (nacionales y locales) de la provincia en el año indicado
+    national(self, year) / provincial(self, prov, year):
+        Devuelven el conjunto nacional del año o solo el local de la provincia
+    is_holiday(self, date, prov="EC-P"):
+        Devuelve True si la fecha (AAAA-MM-DD) es feriado en la provincia, de lo contrario, False
+    cache_info(self):
+        Devuelve los contadores de aciertos y fallos de la caché
+    cache_clear(self):
+        Vacía la caché y reinicia los contadores
+    invalidate(self, years=None, provinces=None):
+        Descarta solo los calendarios de los años y provincias indicados
+    """
 
-    def __is_holiday(self, date, online):
+    def __init__(self, maxsize=32, snapshot=None):
         """
-        Comprueba si la fecha (en formato ISO 8601 AAAA-MM-DD) es un día festivo en Ecuador
-        si en línea == Verdadero, utilizará una API REST, de lo contrario, generará los días festivos del año examinado
-        
+        Construye todos los atributos necesarios para el objeto HolidayCalendarCache.
+
+        Parámetros
+        ----------
+        maxsize: int, opcional
+            número máximo de pares (provincia, año) en la caché (el valor predeterminado es 32)
+        snapshot: HolidaySnapshot, opcional
+            instantánea precalculada que se consulta antes de construir un HolidayEcuador
+        """
+        if maxsize < 1:
+            raise ValueError('El tamaño máximo de la caché debe ser al menos 1')
+        self.maxsize = maxsize
+        self.snapshot = snapshot
+        self.hits = 0
+        self.misses = 0
+        self._calendars = OrderedDict()
+        self._lock = threading.Lock()
+
+    def holidays(self, prov, year):
+        """
+        Devuelve el conjunto de feriados (nacionales y locales) de la provincia en el año indicado
+
+        Parámetros
+        ----------
+        prov: str
+            código de provincia según ISO3166-2
+        year: int
+            año que se consulta
+        Devoluciones
+        -------
+        Un frozenset con las fechas festivas en formato AAAA-MM-DD
+        """
+        return self.national(year) | self.provincial(prov, year)
+
+    def national(self, year):
+        """Devuelve el frozenset de feriados nacionales del año (AAAA-MM-DD)"""
+        return self._calendar(None, year)
+
+    def provincial(self, prov, year):
+        """Devuelve el frozenset de feriados locales de la provincia en el año (AAAA-MM-DD)"""
+        return self._calendar(prov, year)
+
+    def _build(self, prov, year):
+        """Calcula el conjunto nacional (prov None) o local de un año desde la instantánea o las reglas"""
+        snapshot = self.snapshot
+        if prov is None:
+            if snapshot is not None and snapshot.covers(snapshot.NATIONAL, year):
+                return snapshot.national_holidays(year)
+            holidays = _HolidayEcuadorRules.national_holidays(year)
+        else:
+            if snapshot is not None and snapshot.covers(prov, year):
+                return snapshot.provincial_holidays(prov, year)
+            holidays = _HolidayEcuadorRules.provincial_holidays(year, prov)
+        return frozenset(day.isoformat() for day, _ in holidays)
+
+    def _calendar(self, prov, year):
+        """Busca un conjunto en la caché (LRU) y lo calcula si no está"""
+        key = (prov, year)
+        with self._lock:
+            calendar = self._calendars.get(key)
+            if calendar is not None:
+                self._calendars.move_to_end(key)
+                self.hits += 1
+                return calendar
+            self.misses += 1
+        # El calendario se construye fuera del candado para no bloquear otros años;
+        # si dos hilos calculan el mismo año a la vez, ambos obtienen el mismo resultado
+        calendar = self._build(prov, year)
+        with self._lock:
+            self._calendars[key] = calendar
+            self._calendars.move_to_end(key)
+            while len(self._calendars) > self.maxsize:
+                self._calendars.popitem(last=False)
+        return calendar
+
+    def is_holiday(self, date, prov="EC-P"):
+        """
+        Comprueba si la fecha (en formato ISO 8601 AAAA-MM-DD) es un día festivo en la provincia
+
+        Parámetros
+        ----------
+        date: str
+            Está siguiendo el formato ISO 8601 AAAA-MM-DD: por ejemplo, 2020-04-22
+        prov: str, opcional
+            código de provincia según ISO3166-2 (el valor predeterminado es "EC-P")
+        Devoluciones
+        -------
+        Devuelve True si la fecha es un día festivo, de lo contrario, False
+        """
+        year = int(date[:4])
+        return date in self.national(year) or date in self.provincial(prov, year)
+
+    def cache_info(self):
+        """Devuelve los contadores de la caché como CacheInfo(hits, misses, maxsize, currsize)"""
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.maxsize, len(self._calendars))
+
+    def cache_clear(self):
+        """Vacía la caché y reinicia los contadores"""
+        with self._lock:
+            self._calendars.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def invalidate(self, years=None, provinces=None):
+        """
+        Descarta los calendarios de los años y provincias indicados, conservando los demás
+
+        Parámetros
+        ----------
+        years: iterable de int, opcional
+            años que se descartan (el valor predeterminado es None: todos)
+        provinces: iterable de str, opcional
+            provincias cuyos feriados locales se descartan; los nacionales solo se descartan
+            si no se indican provincias (el valor predeterminado es None: todas)
+        """
+        years = None if years is None else set(years)
+        provinces = None if provinces is None else set(provinces)
+        with self._lock:
+            for prov, year in list(self._calendars):
+                if (years is None or year in years) and (provinces is None or prov in provinces):
+                    del self._calendars[(prov, year)]
+
+
+# Caché compartida por todas las instancias de PicoPlaca del proceso
+holiday_cache = HolidayCalendarCache()
+
+
+class PredictionMetrics:
+    """
+    Instrumentación opcional de las predicciones (PredictionMetrics)
+    Registra tiempos por etapa (interpretación de la entrada, evaluación de reglas,
+    consulta de feriados, llamada en línea, solicitudes a la API), el número de decisiones
+    por motivo y, al exportar, la tasa de aciertos de holiday_cache. Desactivada, cada
+    predicción solo paga la comprobación de un atributo.
+    ...
+    Atributos
+    ----------
+    enabled: bool
+        si es True se registran las métricas
+    Métodos
+    -------
+    enable(self) / disable(self):
+        Activa o desactiva el registro
+    reset(self):
+        Reinicia todos los contadores
+    observe(self, stage, seconds):
+        Registra la duración de una etapa
+    count_decision(self, reason, amount=1):
+        Registra decisiones por motivo
+    count_batch_outcome(self, outcome, amount=1):
+        Registra resultados de predict_batch (sin motivo)
+    snapshot(self):
+        Devuelve las métricas como un diccionario serializable en JSON
+    to_prometheus(self):
+        Devuelve las métricas en el formato de texto de Prometheus
+    """
+    # Motivos de decisión y si el vehículo puede circular
+    REASONS = {
+        'exempt': True,
+        'off_peak': True,
+        'unrestricted_day': True,
+        'holiday': True,
+        'restricted': False}
+
+    def __init__(self, enabled=False):
+        """
+        Construye todos los atributos necesarios para el objeto PredictionMetrics.
+
+        Parámetros
+        ----------
+        enabled: bool, opcional
+            si se registran las métricas desde el inicio (el valor predeterminado es False)
+        """
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._decisions = {}
+        self._batch_outcomes = {}
+
+    def enable(self):
+        """Activa el registro de métricas"""
+        self.enabled = True
+
+    def disable(self):
+        """Desactiva el registro de métricas"""
+        self.enabled = False
+
+    def reset(self):
+        """Reinicia todos los contadores"""
+        with self._lock:
+            self._stages.clear()
+            self._decisions.clear()
+            self._batch_outcomes.clear()
+
+    def observe(self, stage, seconds):
+        """
+        Registra la duración de una etapa
+
+        Parámetros
+        ----------
+        stage: str
+            nombre de la etapa, por ejemplo 'holiday_lookup'
+        seconds: float
+            duración en segundos
+        """
+        with self._lock:
+            stats = self._stages.get(stage)
+            if stats is None:
+                self._stages[stage] = [1, seconds, seconds]
+            else:
+                stats[0] += 1
+                stats[1] += seconds
+                if seconds > stats[2]:
+                    stats[2] = seconds
+
+    def count_decision(self, reason, amount=1):
+        """
+        Registra decisiones por motivo
+
+        Parámetros
+        ----------
+        reason: str
+            uno de REASONS
+        amount: int, opcional
+            número de decisiones (el valor predeterminado es 1)
+        """
+        with self._lock:
+            self._decisions[reason] = self._decisions.get(reason, 0) + amount
+
+    def count_batch_outcome(self, outcome, amount=1):
+        """
+        Registra resultados de predict_batch, que no calcula el motivo de cada decisión;
+        se exportan aparte para no mezclarlos con los motivos de count_decision
+
+        Parámetros
+        ----------
+        outcome: str
+            'allowed' o 'forbidden'
+        amount: int, opcional
+            número de resultados (el valor predeterminado es 1)
+        """
+        with self._lock:
+            self._batch_outcomes[outcome] = self._batch_outcomes.get(outcome, 0) + amount
+
+    def snapshot(self):
+        """
+        Devuelve las métricas como un diccionario serializable en JSON
+
+        Devoluciones
+        -------
+        Un diccionario con las etapas (número, suma y máximo en segundos), las decisiones
+        por motivo, los resultados por lote, los contadores de holiday_cache y las
+        solicitudes a la API en línea
+        """
+        with self._lock:
+            stages = {stage: {'count': count, 'sum_s': total, 'max_s': peak, 'mean_us': total / count * 1e6}
+                      for stage, (count, total, peak) in self._stages.items()}
+            decisions = dict(self._decisions)
+            batch_decisions = dict(self._batch_outcomes)
+        cache = holiday_cache.cache_info()
+        lookups = cache.hits + cache.misses
+        online_requests = stages.get('online_api_request', {}).get('count', 0)
+        return {
+            'enabled': self.enabled,
+            'stages': stages,
+            'decisions': decisions,
+            'batch_decisions': batch_decisions,
+            'holiday_cache': dict(cache._asdict(), hit_ratio=cache.hits / lookups if lookups else None),
+            'online': {'api_requests': online_requests}}
+
+    def to_prometheus(self):
+        """Devuelve las métricas en el formato de texto de exposición de Prometheus"""
+        data = self.snapshot()
+        lines = [
+            '# HELP pico_placa_stage_seconds Time spent in each prediction stage.',
+            '# TYPE pico_placa_stage_seconds summary']
+        for stage, stats in sorted(data['stages'].items()):
+            lines.append('pico_placa_stage_seconds_count{{stage="{}"}} {}'.format(stage, stats['count']))
+            lines.append('pico_placa_stage_seconds_sum{{stage="{}"}} {!r}'.format(stage, stats['sum_s']))
+        lines += [
+            '# HELP pico_placa_decisions_total Prediction decisions by reason.',
+            '# TYPE pico_placa_decisions_total counter']
+        for reason, count in sorted(data['decisions'].items()):
+            lines.append('pico_placa_decisions_total{{reason="{}"}} {}'.format(reason, count))
+        lines += [
+            '# HELP pico_placa_batch_decisions_total Batch prediction outcomes (predict_batch does not compute reasons).',
+            '# TYPE pico_placa_batch_decisions_total counter']
+        for outcome, count in sorted(data['batch_decisions'].items()):
+            lines.append('pico_placa_batch_decisions_total{{outcome="{}"}} {}'.format(outcome, count))
+        cache = data['holiday_cache']
+        lines += [
+            '# HELP pico_placa_holiday_cache_hits_total Holiday calendar cache hits.',
+            '# TYPE pico_placa_holiday_cache_hits_total counter',
+            'pico_placa_holiday_cache_hits_total {}'.format(cache['hits']),
+            '# HELP pico_placa_holiday_cache_misses_total Holiday calendar cache misses.',
+            '# TYPE pico_placa_holiday_cache_misses_total counter',
+            'pico_placa_holiday_cache_misses_total {}'.format(cache['misses']),
+            '# HELP pico_placa_online_api_requests_total Requests sent to the online holidays API (quota use).',
+            '# TYPE pico_placa_online_api_requests_total counter',
+            'pico_placa_online_api_requests_total {}'.format(data['online']['api_requests'])]
+        return '\n'.join(lines) + '\n'
+
+
+# Métricas del proceso; se activan con metrics.enable() o la variable de entorno PICO_PLACA_METRICS=1
+metrics = PredictionMetrics(enabled=os.environ.get('PICO_PLACA_METRICS') == '1')
+
+
+def invalidate_holidays(years=None, provinces=None):
+    """
+    Descarta los feriados calculados de los años y provincias indicados en todas las cachés
+    del proceso (reglas por año de HolidayEcuador y holiday_cache), por ejemplo cuando
+    cambian las reglas de traslado de la LOSEP. La instantánea asociada a holiday_cache
+    se desasocia, porque fue calculada con las reglas anteriores.
+
+    Parámetros
+    ----------
+    years: iterable de int, opcional
+        años que se descartan (el valor predeterminado es None: todos)
+    provinces: iterable de str, opcional
+        provincias que se descartan (el valor predeterminado es None: todas)
+    """
+    years = None if years is None else list(years)
+    provinces = None if provinces is None else list(provinces)
+    _HolidayEcuadorRules.invalidate(years, provinces)
+    holiday_cache.invalidate(years, provinces)
+    holiday_cache.snapshot = None
+
+
+class TokenBucket:
+    """
+    Limitador de frecuencia de tipo cubeta de fichas (TokenBucket) para corrutinas
+    ...
+    Atributos
+    ----------
+    rate: float
+        fichas que se recargan por segundo
+    capacity: float
+        número máximo de fichas acumuladas (ráfaga permitida)
+    Métodos
+    -------
+    acquire(self):
+        Espera hasta que haya una ficha disponible y la consume
+    """
+
+    def __init__(self, rate=1.0, capacity=1.0):
+        """
+        Construye todos los atributos necesarios para el objeto TokenBucket.
+
+        Parámetros
+        ----------
+        rate: float, opcional
+            fichas por segundo (el valor predeterminado es 1.0, el límite de la versión gratuita de abstractapi)
+        capacity: float, opcional
+            ráfaga máxima (el valor predeterminado es 1.0)
+        """
+        if rate <= 0 or capacity < 1:
+            raise ValueError('La frecuencia debe ser positiva y la capacidad al menos 1')
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = None
+
+    async def acquire(self):
+        """Espera hasta que haya una ficha disponible y la consume"""
+        import asyncio
+
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class OnlineHolidayBackend:
+    """
+    Un cliente asíncrono de la API de días festivos de abstractapi (OnlineHolidayBackend)
+    Consulta los feriados de un año completo en lugar de un día, reutiliza las conexiones
+    HTTP (requests.Session), respeta el límite de solicitudes con un TokenBucket, une las
+    consultas del mismo año que ya están en curso y guarda las respuestas en una caché
+    en disco con vencimiento (TTL) para no gastar la cuota al reiniciar.
+    ...
+    Atributos
+    ----------
+    api_key: str
+        clave de la API (por defecto la variable de entorno HOLIDAYS_API_KEY)
+    base_url: str
+        URL del servicio; se puede apuntar a un servidor local de pruebas
+    cache_path: str
+        archivo JSON donde se guarda la caché en disco (None para desactivarla)
+    ttl: float
+        segundos durante los que una respuesta guardada sigue siendo válida
+    timeout: float
+        segundos máximos de espera por respuesta
+    Métodos
+    -------
+    holidays(self, year):
+        Corrutina que devuelve el conjunto de feriados del año (AAAA-MM-DD)
+    is_holiday(self, date):
+        Corrutina que devuelve True si la fecha es feriado, de lo contrario, False
+    holidays_blocking(self, year):
+        Versión bloqueante de holidays para código sin bucle de eventos
+    is_holiday_blocking(self, date):
+        Versión bloqueante de is_holiday para código sin bucle de eventos
+    close(self):
+        Cierra la sesión HTTP y el bucle de eventos interno
+    """
+
+    def __init__(self, api_key=None, base_url='https://holidays.abstractapi.com/v1/', country='EC',
+                 cache_path=None, ttl=30 * 24 * 3600, rate=1.0, capacity=1.0, timeout=10.0, pool_size=4):
+        """
+        Construye todos los atributos necesarios para el objeto OnlineHolidayBackend.
+
+        Parámetros
+        ----------
+        api_key: str, opcional
+            clave de la API (el valor predeterminado es la variable de entorno HOLIDAYS_API_KEY)
+        base_url: str, opcional
+            URL del servicio (el valor predeterminado es la API de abstractapi)
+        country: str, opcional
+            código de país (el valor predeterminado es 'EC')
+        cache_path: str, opcional
+            archivo de la caché en disco (el valor predeterminado es None: sin caché en disco)
+        ttl: float, opcional
+            vigencia de la caché en segundos (el valor predeterminado es 30 días)
+        rate: float, opcional
+            solicitudes por segundo permitidas (el valor predeterminado es 1.0)
+        capacity: float, opcional
+            ráfaga máxima de solicitudes (el valor predeterminado es 1.0)
+        timeout: float, opcional
+            tiempo máximo de espera por respuesta en segundos (el valor predeterminado es 10.0)
+        pool_size: int, opcional
+            conexiones que se mantienen abiertas en la sesión (el valor predeterminado es 4)
+        """
+        self.api_key = api_key if api_key is not None else os.environ.get('HOLIDAYS_API_KEY')
+        self.base_url = base_url
+        self.country = country
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self.timeout = timeout
+        import requests
+
+        self.requests_sent = 0
+        self._bucket = TokenBucket(rate, capacity)
+        self._session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+        self._years = self._load_cache()
+        self._in_flight = {}
+        self._loop = None
+        self._loop_lock = threading.Lock()
+
+    def _load_cache(self):
+        """Lee la caché en disco y devuelve {año: (fecha de consulta, frozenset de feriados)} sin las entradas vencidas"""
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path, encoding='utf-8') as cache_file:
+                stored = json.load(cache_file)
+        except (OSError, ValueError):
+            return {}
+        now = time.time()
+        return {int(year): (entry['fetched'], frozenset(entry['dates']))
+                for year, entry in stored.items()
+                if now - entry['fetched'] < self.ttl}
+
+    def _cache_payload(self):
+        """Copia la caché en memoria en un diccionario serializable; se llama desde el bucle de eventos"""
+        return {str(year): {'fetched': fetched, 'dates': sorted(dates)}
+                for year, (fetched, dates) in self._years.items()}
+
+    def _save_cache(self, stored):
+        """Escribe en disco, de forma atómica (archivo temporal + os.replace), la copia hecha por _cache_payload"""
+        if not self.cache_path:
+            return
+        directory = os.path.dirname(os.path.abspath(self.cache_path))
+        import tempfile
+
+        descriptor, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'w', encoding='utf-8') as tmp_file:
+                json.dump(stored, tmp_file)
+            os.replace(tmp_path, self.cache_path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _fetch_year(self, year):
+        """Consulta de forma bloqueante los feriados de un año y devuelve un frozenset AAAA-MM-DD"""
+        import requests
+
+        start = time.perf_counter()
+        response = self._session.get(
+            self.base_url,
+            params={'api_key': self.api_key, 'country': self.country, 'year': year},
+            timeout=self.timeout)
+        self.requests_sent += 1
+        if metrics.enabled:
+            metrics.observe('online_api_request', time.perf_counter() - start)
+        if response.status_code == 401:
+            # Esto significa que falta una clave API
+            raise requests.HTTPError(
+                'Missing API key. Store your key in the enviroment variable HOLIDAYS_API_KEY')
+        response.raise_for_status()
+        dates = set()
+        for holiday in response.json():
+            # Arreglar el Jueves Santo incorrectamente denotado como feriado
+            if holiday.get('name') == 'Maundy Thursday':
+                continue
+            month, day, year_ = holiday['date'].split('/')
+            dates.add('{}-{}-{}'.format(year_, month.zfill(2), day.zfill(2)))
+        return frozenset(dates)
+
+    async def _load_year(self, year):
+        """Respeta el límite de solicitudes, consulta el año y lo guarda en las cachés"""
+        import asyncio
+
+        await self._bucket.acquire()
+        dates = await asyncio.to_thread(self._fetch_year, year)
+        self._years[year] = (time.time(), dates)
+        # La copia se hace en el hilo del bucle: otra tarea podría agregar un año mientras se escribe
+        await asyncio.to_thread(self._save_cache, self._cache_payload())
+        return dates
+
+    async def holidays(self, year):
+        """
+        Devuelve el conjunto de feriados del año, consultando la API solo si no está en caché
+
+        Parámetros
+        ----------
+        year: int
+            año que se consulta
+        Devoluciones
+        -------
+        Un frozenset con las fechas festivas en formato AAAA-MM-DD
+        """
+        import asyncio
+
+        cached = self._years.get(year)
+        if cached is not None and time.time() - cached[0] < self.ttl:
+            return cached[1]
+        # Las consultas del mismo año que ya están en curso esperan la misma tarea
+        task = self._in_flight.get(year)
+        if task is None:
+            task = asyncio.ensure_future(self._load_year(year))
+            self._in_flight[year] = task
+            task.add_done_callback(lambda _, year=year: self._in_flight.pop(year, None))
+        return await asyncio.shield(task)
+
+    async def is_holiday(self, date):
+        """
+        Comprueba si la fecha (en formato ISO 8601 AAAA-MM-DD) es un día festivo según la API
+
+        Parámetros
+        ----------
+        date: str
+            Está siguiendo el formato ISO 8601 AAAA-MM-DD: por ejemplo, 2020-04-22
+        Devoluciones
+        -------
+        Devuelve True si la fecha es un día festivo, de lo contrario, False
+        """
+        return date in await self.holidays(int(date[:4]))
+
+    def _run_blocking(self, coroutine):
+        """Ejecuta la corrutina en un bucle de eventos propio en segundo plano y espera su resultado"""
+        import asyncio
+
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name='online-holidays', daemon=True).start()
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def holidays_blocking(self, year):
+        """Versión bloqueante de holidays: devuelve el frozenset de feriados del año (AAAA-MM-DD)"""
+        return self._run_blocking(self.holidays(year))
+
+    def is_holiday_blocking(self, date):
+        """Versión bloqueante de is_holiday: ejecuta la corrutina en un bucle de eventos propio en segundo plano"""
+        return self._run_blocking(self.is_holiday(date))
+
+    def close(self):
+        """Cierra la sesión HTTP y detiene el bucle de eventos interno"""
+        with self._loop_lock:
+            if self._loop is not None:
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._loop = None
+        self._session.close()
+
+
+_online_backend = None
+_online_backend_lock = threading.Lock()
+
+
+def online_backend():
+    """
+    Devuelve el OnlineHolidayBackend compartido por el proceso, creándolo la primera vez
+
+    La caché en disco se guarda en el archivo indicado por la variable de entorno
+    HOLIDAYS_CACHE_FILE (por defecto ~/.cache/pico_placa_holidays.json).
+    """
+    global _online_backend
+    with _online_backend_lock:
+        if _online_backend is None:
+            cache_path = os.environ.get(
+                'HOLIDAYS_CACHE_FILE', os.path.join(os.path.expanduser('~'), '.cache', 'pico_placa_holidays.json'))
+            os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+            _online_backend = OnlineHolidayBackend(cache_path=cache_path)
+        return _online_backend
+
+
+class HybridHolidayResolver:
+    """
+    Un resolutor de feriados híbrido, primero fuera de línea (HybridHolidayResolver)
+    Responde siempre al instante: primero con la tabla local de excepciones, luego con el
+    calendario nacional de la fuente en línea si el año ya fue conciliado y, si no, con el
+    calendario local (holiday_cache). La primera consulta de un año lo encola para que un
+    hilo en segundo plano descargue el año completo del OnlineHolidayBackend y lo concilie
+    con el calendario local; desde entonces se usan los feriados nacionales de la API (por
+    ejemplo, los trasladados por decreto) junto con los feriados locales de la provincia.
+    Si la descarga falla, o la respuesta no es plausible (vacía o con menos de
+    min_agreement de los feriados nacionales locales, por ejemplo por falta de cuota o
+    un año fuera de la cobertura de la API), el año sigue respondiéndose localmente y se
+    reintenta pasado retry_after.
+    ...
+    Atributos
+    ----------
+    prov: str
+        código de provincia según ISO3166-2 de los feriados locales
+    overrides: dict
+        tabla de excepciones {AAAA-MM-DD: bool} que prevalece sobre ambas fuentes, para
+        discrepancias conocidas como el Jueves Santo que la API marca como feriado
+    retry_after: float
+        segundos antes de reintentar un año cuya descarga falló
+    min_agreement: float
+        fracción mínima de los feriados nacionales locales que debe incluir la respuesta en línea
+    errors: int
+        número de descargas fallidas
+    Métodos
+    -------
+    is_holiday(self, date):
+        Devuelve True si la fecha es feriado, sin esperar a la red
+    reconcile(self, years):
+        Encola la conciliación de los años indicados
+    wait(self, timeout=None):
+        Espera a que terminen las conciliaciones encoladas
+    discrepancies(self, year):
+        Devuelve las diferencias entre la fuente en línea y el calendario local de un año conciliado
+    set_override(self, date, holiday) / remove_override(self, date):
+        Modifica la tabla de excepciones
+    """
+
+    def __init__(self, backend=None, prov='EC-P', overrides=None, retry_after=300.0, min_agreement=0.5):
+        """
+        Construye todos los atributos necesarios para el objeto HybridHolidayResolver.
+
+        Parámetros
+        ----------
+        backend: OnlineHolidayBackend, opcional
+            fuente en línea (el valor predeterminado es None: el de online_backend(), creado al conciliar el primer año)
+        prov: str, opcional
+            código de provincia según ISO3166-2 (el valor predeterminado es "EC-P")
+        overrides: dict, opcional
+            excepciones iniciales {AAAA-MM-DD: bool} (el valor predeterminado es None)
+        retry_after: float, opcional
+            segundos antes de reintentar una descarga fallida (el valor predeterminado es 300.0)
+        min_agreement: float, opcional
+            fracción mínima de feriados nacionales locales presentes en la respuesta en línea
+            para aceptarla (el valor predeterminado es 0.5)
+        """
+        import queue
+
+        self.prov = prov
+        self.overrides = dict(overrides or {})
+        self.retry_after = retry_after
+        self.min_agreement = min_agreement
+        self.errors = 0
+        self._backend = backend
+        self._remote = {}
+        self._discrepancies = {}
+        self._failed = {}
+        self._scheduled = set()
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._thread = None
+
+    def is_holiday(self, date):
+        """
+        Comprueba si la fecha (en formato ISO 8601 AAAA-MM-DD) es un día festivo sin esperar a la red
+
+        Parámetros
+        ----------
+        date: str
+            Está siguiendo el formato ISO 8601 AAAA-MM-DD: por ejemplo, 2020-04-22
+        Devoluciones
+        -------
+        Devuelve True si la fecha es un día festivo, de lo contrario, False
+        """
+        override = self.overrides.get(date)
+        if override is not None:
+            return override
+        year = int(date[:4])
+        remote = self._remote.get(year)
+        if remote is None:
+            self._schedule(year)
+            return holiday_cache.is_holiday(date, self.prov)
+        return date in remote or date in holiday_cache.provincial(self.prov, year)
+
+    def reconcile(self, years):
+        """
+        Encola la conciliación en segundo plano de los años indicados (por ejemplo, para precargarlos)
+
+        Parámetros
+        ----------
+        years: iterable de int
+            años que se concilian
+        """
+        for year in years:
+            self._schedule(year)
+
+    def wait(self, timeout=None):
+        """
+        Espera a que terminen las conciliaciones encoladas
+
+        Parámetros
+        ----------
+        timeout: float, opcional
+            segundos máximos de espera (el valor predeterminado es None: sin límite)
+        Devoluciones
+        -------
+        Devuelve True si no queda ninguna conciliación pendiente, de lo contrario, False
+        """
+        with self._idle:
+            return self._idle.wait_for(lambda: not self._scheduled, timeout)
+
+    def discrepancies(self, year):
+        """
+        Devuelve las diferencias entre la fuente en línea y el calendario nacional local de un año
+
+        Parámetros
+        ----------
+        year: int
+            año que se consulta
+        Devoluciones
+        -------
+        Una tupla (solo en línea, solo local) de frozensets AAAA-MM-DD, o None si el año
+        todavía no se ha conciliado
+        """
+        return self._discrepancies.get(year)
+
+    def set_override(self, date, holiday):
+        """
+        Fija el resultado de una fecha por encima de ambas fuentes
+
+        Parámetros
+        ----------
+        date: str
+            fecha en formato ISO 8601 AAAA-MM-DD
+        holiday: bool
+            True si la fecha debe tratarse como feriado, de lo contrario, False
+        """
+        self.overrides[date] = bool(holiday)
+
+    def remove_override(self, date):
+        """Elimina la excepción de una fecha, si existe"""
+        self.overrides.pop(date, None)
+
+    def _schedule(self, year):
+        """Encola el año si no está conciliado, encolado o esperando un reintento"""
+        with self._lock:
+            if year in self._remote or year in self._scheduled:
+                return
+            failed = self._failed.get(year)
+            if failed is not None and time.monotonic() - failed < self.retry_after:
+                return
+            self._scheduled.add(year)
+            self._queue.put(year)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='hybrid-holidays', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        """Bucle del hilo en segundo plano: concilia los años encolados uno por uno"""
+        while True:
+            year = self._queue.get()
+            try:
+                self._reconcile_year(year)
+            except Exception:
+                with self._lock:
+                    self.errors += 1
+                    self._failed[year] = time.monotonic()
+            finally:
+                with self._idle:
+                    self._scheduled.discard(year)
+                    self._idle.notify_all()
+
+    def _reconcile_year(self, year):
+        """Descarga los feriados del año, los compara con el calendario local y los publica"""
+        if self._backend is None:
+            self._backend = online_backend()
+        remote = frozenset(self._backend.holidays_blocking(year))
+        local = holiday_cache.national(year)
+        # Una respuesta vacía o truncada se trata como una descarga fallida: el año sigue local
+        if not remote or len(remote & local) < self.min_agreement * len(local):
+            raise ValueError('Respuesta en línea no plausible para {}: {} de {} feriados nacionales'.format(
+                year, len(remote & local), len(local)))
+        with self._lock:
+            self._discrepancies[year] = (remote - local, local - remote)
+            self._failed.pop(year, None)
+            self._remote[year] = remote
+
+
+_hybrid_resolver = None
+
+
+def hybrid_resolver():
+    """Devuelve el HybridHolidayResolver compartido por el proceso, creándolo la primera vez"""
+    global _hybrid_resolver
+    with _online_backend_lock:
+        if _hybrid_resolver is None:
+            _hybrid_resolver = HybridHolidayResolver()
+        return _hybrid_resolver
+
+
+# Patrones precompilados de validación de PicoPlaca
+_PLATE_PATTERN = re.compile('[A-Z]{2,3}-[0-9]{4}')
+_DATE_PATTERN = re.compile('[0-9]{4}-[0-9]{2}-[0-9]{2}')
+_TIME_PATTERN = re.compile('([01][0-9]|2[0-3]):[0-5][0-9]')
+
+
+def _compile_restriction_table(days, restrictions):
+    """
+    Compila el diccionario de restricciones {día: últimos dígitos prohibidos} en una tabla compacta
+
+    Parámetros
+    ----------
+    days: lista de str
+        nombres de los días en el orden de datetime.weekday()
+    restrictions: dict
+        restricciones de la forma {día: [último dígito prohibido]}
+    Devoluciones
+    -------
+    Un bytearray de 7x10 donde table[día * 10 + dígito] == 1 si el dígito está restringido ese día
+    """
+    table = bytearray(7 * 10)
+    for weekday, day in enumerate(days):
+        for digit in restrictions[day]:
+            table[weekday * 10 + digit] = 1
+    return table
+
+
+class PicoPlaca:
+    """
+    Una clase para representar un vehículo.
+    medida de restricción (Pico y Placa)
+    - ORDENANZA METROPOLITANA N° 0305
+    http://www7.quito.gob.ec/mdmq_ordenanzas/Ordenanzas/ORDENANZAS%20A%C3%91OS%20ANTERIORES/ORDM-305-%20%20CIRCULACION%20VEHICULAR%20PICO%20Y%20PLACA.pdf
+    ...
+    Atributos
+    ----------
+    placa : calle
+        El registro o patente de un vehículo es una combinación de caracteres alfabéticos o numéricos
+        caracteres que identifican e individualizan el vehículo respecto de los demás;
+        
+        El formato utilizado es
+        XX-AAAA o XXX-AAAA,
+        donde X es una letra mayúscula e Y es un dígito.
+    fecha: calle
+        Fecha en que el vehiculo pretende transitar
+        esta siguiendo el
+        Formato ISO 8601 AAAA-MM-DD: por ejemplo, 2020-04-22.
+    tiempo: calle
+        tiempo en que el vehiculo pretende transitar
+        esta siguiendo el formato
+        HH:MM: por ejemplo, 08:35, 19:30
+    en línea: booleano o 'hybrid', opcional
+        si en línea == Verdadero, se aseguró la API de días festivos abstractos; con 'hybrid',
+        el calendario local conciliado en segundo plano (HybridHolidayResolver)
+    Métodos
+    -------
+    __init__(self, plate, date, time, online=False):
+        Construye todos los atributos necesarios.
+        para el objeto PicoPlaca.
+    plato (uno mismo):
+        Obtiene el valor del atributo de placa
+    placa (auto, valor):
+        Establece el valor del atributo de la placa
+    fecha (uno mismo):
+        Obtiene el valor del atributo de fecha
+    fecha (auto, valor):
+        Establece el valor del atributo de fecha
+    tiempo (uno mismo):
+        Obtiene el valor del atributo de tiempo
+    tiempo (uno mismo, valor):
+        Establece el valor del atributo de tiempo
+    __is_forbidden_time(self, minute):
+        Devuelve True si el minuto del día proporcionado está dentro de las horas pico prohibidas, de lo contrario, False
+    __es_vacaciones:
+        Devuelve True si la fecha marcada (en formato ISO 8601 AAAA-MM-DD) es un día festivo en Ecuador, de lo contrario, False
+    predecir (automático):
+        Devuelve True si el vehículo con la placa especificada puede estar en la carretera en la fecha y hora especificadas, de lo contrario, False
+    predict_batch(cls, plates, dates, times):
+        Versión vectorizada de predict() para lotes de vehículos
+    forbidden_intervals(cls, plate, start, end, online=False):
+        Devuelve los intervalos en los que el vehículo no puede circular entre dos instantes
+    allowed_intervals(cls, plate, start, end, online=False):
+        Devuelve los intervalos en los que el vehículo puede circular entre dos instantes
+    next_allowed(cls, plate, from_datetime, online=False):
+        Devuelve el primer instante desde from_datetime en que el vehículo puede circular
+    """
+    #Días de la semana 
+    __days = [
+            "Monday",
+            "Tuesday",
+            "Wednesday",
+            "Thursday",
+            "Friday",
+            "Saturday",
+            "Sunday"]
+
+    # Diccionario que contiene las restricciones de la forma {día: último dígito prohibido}
+    __restrictions = {
+            "Monday": [1, 2],
+            "Tuesday": [3, 4],
+            "Wednesday": [5, 6],
+            "Thursday": [7, 8],
+            "Friday": [9, 0],
+            "Saturday": [],
+            "Sunday": []}
+
+    # Cada valor se valida y se interpreta una sola vez al asignarlo; predict() solo lee
+    # los enteros guardados (día de la semana, minuto del día, último dígito)
+    __slots__ = ('_plate', '_exempt', '_last_digit', '_date', '_weekday', '_time', '_minute', 'online')
+
+    # Tablas precompiladas de las reglas; predict() y predict_batch() solo leen de ellas
+    # Restricciones como bytearray de 7x10: índice = día de la semana * 10 + último dígito
+    __restriction_table = _compile_restriction_table(__days, __restrictions)
+    # Segundas letras exentas (AUZEXM) como bytearray de 26: índice = letra - 'A'
+    __exempt_letters = bytearray(1 if letter in 'AUZEXM' else 0 for letter in 'ABCDEFGHIJKLMNOPQRSTUVWXYZ')
+    # Horas pico como rangos cerrados de minutos del día: 07:00 - 09:30 y 16:00 - 19:30
+    __peak_windows = ((7 * 60, 9 * 60 + 30), (16 * 60, 19 * 60 + 30))
+
+    def __init__(self, plate, date, time, online=False):
+        """
+        Construye todos los atributos necesarios para el objeto PicoPlaca.
+        
+        Parámetros
+        ----------
+            placa : calle
+                El registro o patente de un vehículo es una combinación de caracteres alfabéticos o numéricos
+                caracteres que identifican e individualizan el vehículo respecto de los demás;
+                El formato utilizado es AA-YYYY o XXX-YYYY, donde X es una letra mayúscula e Y es un dígito.
+            fecha: calle
+                Fecha en la que el vehículo pretende transitar
+                Sigue el formato ISO 8601 AAAA-MM-DD: por ejemplo, 2020-04-22.
+            tiempo: calle
+                tiempo en que el vehículo pretende transitar
+                Sigue el formato HH:MM: por ejemplo, 08:35, 19:30
+            en línea: booleano o 'hybrid', opcional
+                si en línea == Verdadero, se usará la API de días festivos abstractos; con 'hybrid', el
+                calendario local conciliado en segundo plano (el valor predeterminado es Falso)
+        """                
+        if metrics.enabled:
+            start = _perf_counter()
+            self.plate = plate
+            self.date = date
+            self.time = time
+            metrics.observe('parsing', _perf_counter() - start)
+        else:
+            self.plate = plate
+            self.date = date
+            self.time = time
+        self.online = online
+
+
+    @property
+    def plate(self):
+        """Obtiene el valor del atributo de placa"""
+        return self._plate
+
+
+    @plate.setter
+    def plate(self, value):
+        """
+        Establece el valor del atributo de la placa
+        Parámetros
+        ----------
+        valor: cadena
+        
+        aumenta
+        ------
+        ValorError
+            Si la cadena de valor no tiene el formato
+            XX-YYYY o XXX-YYYY,
+            donde X es una letra mayúscula e Y es un dígito
+        """
+        if not _PLATE_PATTERN.fullmatch(value):
+            raise ValueError(
+                'La placa debe tener el siguiente formato: XX-YYYY o XXX-YYYY, donde X es una letra mayúscula e Y es un dígito')
+        self._plate = value
+        # Exenta según la segunda letra de la placa o si se utilizan sólo dos letras
+        self._exempt = value[2] == '-' or self.__exempt_letters[ord(value[1]) - 65] == 1
+        self._last_digit = ord(value[-1]) - 48
+
+
+    @property
+    def date(self):
+        """Obtiene el valor del atributo de fecha"""
+        return self._date
+
+
+    @date.setter
+    def date(self, value):
+        """
+        Establece el valor del atributo de fecha
+        Parámetros
+        ----------
+        valor: cadena
+        
+        aumenta
+        ------
+        ValorError
+            Si la cadena de valor no tiene el formato AAAA-MM-DD (por ejemplo, 2021-04-02)
+        """
+        try:
+            if not _DATE_PATTERN.fullmatch(value):
+                raise ValueError
+            weekday = datetime.date(int(value[0:4]), int(value[5:7]), int(value[8:10])).weekday()
+        except ValueError:
+            raise ValueError(
+                'La fecha debe tener el siguiente formato: AAAA-MM-DD (por ejemplo: 2021-04-02)') from None
+        self._date = value
+        self._weekday = weekday
+        
+
+    @property
+    def time(self):
+        """Obtiene el valor del atributo de tiempo"""
+        return self._time
+
+
+    @time.setter
+    def time(self, value):
+        """
+        Establece el valor del atributo de tiempo
+        Parámetros
+        ----------
+        valor: cadena
+        
+        aumenta
+        ------
+        ValorError
+            Si la cadena de valor no tiene el formato HH:MM (por ejemplo, 08:31, 14:22, 00:01)
+        """
+        if not _TIME_PATTERN.fullmatch(value):
+            raise ValueError(
+                'The time must be in the following format: HH:MM (e.g., 08:31, 14:22, 00:01)')
+        self._time = value
+        self._minute = int(value[0:2]) * 60 + int(value[3:5])
+
+
+    def __is_forbidden_time(self, minute):
+        """
+        Comprueba si el tiempo proporcionado está dentro de las horas pico prohibidas,
+        donde las horas pico son: 07:00 - 09:30 y 16:00 - 19:30
+        Parámetros
+        ----------
+        minute : int
+            Minuto del día que se comprobará: por ejemplo, 515 (08:35)
+        Devoluciones
+        -------
+        Devuelve True si el tiempo proporcionado está dentro de las horas pico prohibidas, de lo contrario, False
+        """           
+        for start, end in self.__peak_windows:
+            if start <= minute <= end:
+                return True
+        return False
+
+
+    @staticmethod
+    def __is_holiday(date, online):
+        """
+        Comprueba si la fecha (en formato ISO 8601 AAAA-MM-DD) es un día festivo en Ecuador
+        si en línea == Verdadero, utilizará una API REST; si en línea == 'hybrid', responderá con el
+        calendario local conciliado en segundo plano (HybridHolidayResolver); de lo contrario, generará
+        los días festivos del año examinado
+        
         Parámetros
         ----------
         fecha: calle
             Está siguiendo el formato ISO 8601 AAAA-MM-DD: por ejemplo, 2020-04-22
-        en línea: booleano, opcional
+        en línea: booleano o 'hybrid', opcional
             si en línea == Verdadero, se utilizará la API de días festivos abstractos
         Devoluciones
         -------
         Devuelve True si la fecha marcada (en formato ISO 8601 AAAA-MM-DD) es un día festivo en Ecuador, de lo contrario, Falso
         """            
-        y, m, d = date.split('-')
 
-        if online:
-            # API de vacaciones abstractapi, versión gratuita: 1000 solicitudes por mes
-            # 1 solicitud por segundo
-            # recuperar la clave API de la variable de entorno
-            key = os.environ.get('HOLIDAYS_API_KEY')
-            response = requests.get(
-                "https://holidays.abstractapi.com/v1/?api_key={}&country=EC&year={}&month={}&day={}".format(key, y, m, d))
-            if (response.status_code == 401):
-                # Esto significa que falta una clave API
-                raise requests.HTTPError(
-                    'Missing API key. Store your key in the enviroment variable HOLIDAYS_API_KEY')
-            if response.content == b'[]':  # si no hay vacaciones obtenemos una matriz vacía
-                return False
-            # Arreglar el Jueves Santo incorrectamente denotado como feriado
-            if json.loads(response.text[1:-1])['name'] == 'Maundy Thursday':
-                return False
-            return True
+        if online == 'hybrid':
+            # Respuesta local inmediata; el año se concilia con la API en segundo plano
+            return hybrid_resolver().is_holiday(date)
+        if online:
+            # API de vacaciones abstractapi, versión gratuita: 1000 solicitudes por mes
+            # 1 solicitud por segundo; se consulta el año completo y se guarda en caché
+            # la clave API se recupera de la variable de entorno HOLIDAYS_API_KEY
+            return online_backend().is_holiday_blocking(date)
+        else:
+            return holiday_cache.is_holiday(date, prov='EC-P')
+
+
+    def predict(self):
+        """
+        Comprueba si el vehículo con la placa especificada puede estar en la carretera en la fecha y hora proporcionada según las reglas de Pico y Placa:
+        http://www7.quito.gob.ec/mdmq_ordenanzas/Ordenanzas/ORDENANZAS%20A%C3%91OS%20ANTERIORES/ORDM-305-%20%20CIRCULACION%20VEHICULAR%20PICO%20Y%20PLACA.pdf
+        Devoluciones
+        -------
+        Devoluciones
+        Verdadero si el vehículo con
+        la placa especificada puede estar en el camino
+        en la fecha y hora especificadas, de lo contrario Falso
+        """
+        if metrics.enabled:
+            return self.__predict_instrumented()
+
+        # Las reglas de la tabla se evalúan primero: el calendario de feriados (y la API en
+        # línea) solo se consulta si el vehículo estaría restringido en esa fecha y hora
+
+        # Consultar vehículos excluidos de la restricción según la segunda letra de la placa o si se utilizan sólo dos letras
+        #https://es.wikipedia.org/wiki/Matr%C3%ADculas_automovil%C3%ADsticas_de_Ecuador
+        if self._exempt:
+            return True
+
+        # Verifique si el tiempo proporcionado no está en las horas pico prohibidas
+        if not self.__is_forbidden_time(self._minute):
+            return True
+
+        # Verifique si el último dígito de la placa no está restringido en este día en particular
+        if not self.__restriction_table[self._weekday * 10 + self._last_digit]:
+            return True
+
+        # Comprobar si la fecha es un día festivo
+        if self.__is_holiday(self._date, self.online):
+            return True
+
+        return False
+
+
+    def __predict_instrumented(self):
+        """
+        Igual que predict(), registrando en metrics el tiempo de cada etapa y el motivo de la decisión
+        Devoluciones
+        -------
+        Verdadero si el vehículo puede estar en el camino, de lo contrario Falso
+        """
+        start = _perf_counter()
+        if self._exempt:
+            reason = 'exempt'
+        elif not self.__is_forbidden_time(self._minute):
+            reason = 'off_peak'
+        elif not self.__restriction_table[self._weekday * 10 + self._last_digit]:
+            reason = 'unrestricted_day'
+        else:
+            reason = None
+        metrics.observe('rule_evaluation', _perf_counter() - start)
+        if reason is None:
+            start = _perf_counter()
+            holiday = self.__is_holiday(self._date, self.online)
+            metrics.observe('online_call' if self.online and self.online != 'hybrid' else 'holiday_lookup',
+                            _perf_counter() - start)
+            reason = 'holiday' if holiday else 'restricted'
+        metrics.count_decision(reason)
+        return metrics.REASONS[reason]
+
+
+    @classmethod
+    def predict_batch(cls, plates, dates, times):
+        """
+        Versión vectorizada de predict() para lotes de vehículos (solo fuera de línea).
+        Las comprobaciones de día de la semana, horas pico, letras exentas y último dígito
+        se calculan como operaciones sobre arreglos de NumPy para todo el lote, y los
+        feriados se resuelven con una sola pasada de pertenencia a conjunto.
+
+        Parámetros
+        ----------
+        plates: secuencia o arreglo de str
+            placas con el formato XX-YYYY o XXX-YYYY
+        dates: secuencia o arreglo de str
+            fechas con el formato ISO 8601 AAAA-MM-DD
+        times: secuencia o arreglo de str
+            horas con el formato HH:MM
+        Devoluciones
+        -------
+        Un arreglo booleano de NumPy: True si el vehículo puede estar en la carretera, de lo contrario False
+
+        aumenta
+        ------
+        ValorError
+            Si las secuencias tienen distinta longitud o algún valor no tiene el formato esperado
+        """
+        import numpy as np
+
+        batch_start = _perf_counter() if metrics.enabled else None
+        try:
+            # Un byte extra permite detectar valores más largos que el formato
+            plate_arr = np.asarray(plates, dtype='S9')
+            date_arr = np.asarray(dates, dtype='S11')
+            time_arr = np.asarray(times, dtype='S6')
+        except UnicodeEncodeError:
+            raise ValueError('Las placas, fechas y horas solo pueden contener caracteres ASCII') from None
+        if not (plate_arr.ndim == date_arr.ndim == time_arr.ndim == 1 and
+                len(plate_arr) == len(date_arr) == len(time_arr)):
+            raise ValueError('Las placas, fechas y horas deben ser secuencias de la misma longitud')
+
+        # Fechas: AAAA-MM-DD como una matriz de bytes (n, 11); el calendario se valida con
+        # aritmética de datetime64 (convertir texto inválido a datetime64 puede abortar el proceso
+        # en NumPy 2.4) y el año 0000 se rechaza igual que en datetime.date
+        d = date_arr.view(np.uint8).reshape(-1, 11)
+        digits = d[:, [0, 1, 2, 3, 5, 6, 8, 9]].astype(np.int64) - ord('0')
+        if not ((np.char.str_len(date_arr) == 10) & (d[:, 4] == ord('-')) & (d[:, 7] == ord('-')) &
+                (digits >= 0).all(axis=1) & (digits <= 9).all(axis=1)).all():
+            raise ValueError('La fecha debe tener el siguiente formato: AAAA-MM-DD (por ejemplo: 2021-04-02)')
+        year = digits[:, :4] @ np.array([1000, 100, 10, 1])
+        month = digits[:, 4] * 10 + digits[:, 5]
+        day = digits[:, 6] * 10 + digits[:, 7]
+        if not ((year >= 1) & (month >= 1) & (month <= 12) & (day >= 1)).all():
+            raise ValueError('La fecha debe tener el siguiente formato: AAAA-MM-DD (por ejemplo: 2021-04-02)')
+        months = (year - 1970).astype('datetime64[Y]').astype('datetime64[M]') + (month - 1)
+        first_days = months.astype('datetime64[D]')
+        if (day > ((months + 1).astype('datetime64[D]') - first_days).astype(np.int64)).any():
+            raise ValueError('La fecha debe tener el siguiente formato: AAAA-MM-DD (por ejemplo: 2021-04-02)')
+        days = first_days + (day - 1)
+
+        # Horas: HH:MM como una matriz de bytes (n, 6)
+        t = time_arr.view(np.uint8).reshape(-1, 6).astype(np.int64) - ord('0')
+        hours = t[:, 0] * 10 + t[:, 1]
+        minutes = t[:, 3] * 10 + t[:, 4]
+        if not ((np.char.str_len(time_arr) == 5) & (t[:, 2] == ord(':') - ord('0')) &
+                (t[:, [0, 1, 3, 4]] >= 0).all(axis=1) & (t[:, [0, 1, 3, 4]] <= 9).all(axis=1) &
+                (hours <= 23) & (minutes <= 59)).all():
+            raise ValueError('The time must be in the following format: HH:MM (e.g., 08:31, 14:22, 00:01)')
+
+        # Placas: XX-YYYY o XXX-YYYY como una matriz de bytes (n, 9)
+        allowed = cls._evaluate_arrays(
+            plate_arr.view(np.uint8).reshape(-1, 9), np.char.str_len(plate_arr), days, hours * 60 + minutes)
+
+        if batch_start is not None:
+            metrics.observe('predict_batch', _perf_counter() - batch_start)
+            allowed_count = int(np.count_nonzero(allowed))
+            metrics.count_batch_outcome('allowed', allowed_count)
+            metrics.count_batch_outcome('forbidden', len(allowed) - allowed_count)
+        return allowed
+
+
+    @classmethod
+    def _evaluate_arrays(cls, p, plate_len, days, minute_of_day):
+        """
+        Aplica las reglas de predict() a columnas de NumPy ya interpretadas; lo usan
+        predict_batch() y predict_columns()
+
+        Parámetros
+        ----------
+        p: numpy.ndarray de uint8 (n, w), w >= 8
+            bytes de cada placa, completados con ceros
+        plate_len: numpy.ndarray de int
+            longitud de cada placa
+        days: numpy.ndarray de datetime64[D]
+            fecha de cada registro
+        minute_of_day: numpy.ndarray de int
+            minuto del día de cada registro (0 - 1439)
+        Devoluciones
+        -------
+        Un arreglo booleano de NumPy: True si el vehículo puede estar en la carretera
+
+        aumenta
+        ------
+        ValorError
+            Si alguna placa no tiene el formato XX-YYYY o XXX-YYYY
+        """
+        import numpy as np
+
+        is_letter = (p >= ord('A')) & (p <= ord('Z'))
+        is_digit = (p >= ord('0')) & (p <= ord('9'))
+        two = (plate_len == 7) & is_letter[:, :2].all(axis=1) & (p[:, 2] == ord('-')) & is_digit[:, 3:7].all(axis=1)
+        three = (plate_len == 8) & is_letter[:, :3].all(axis=1) & (p[:, 3] == ord('-')) & is_digit[:, 4:8].all(axis=1)
+        if not (two | three).all():
+            raise ValueError(
+                'La placa debe tener el siguiente formato: XX-YYYY o XXX-YYYY, donde X es una letra mayúscula e Y es un dígito')
+        last_digit = p[np.arange(len(p)), plate_len - 1] - ord('0')
+        exempt = two | np.frombuffer(cls.__exempt_letters, dtype=bool)[p[:, 1] - ord('A')]
+
+        # El 1970-01-01 fue jueves (weekday() == 3)
+        weekday = (days.astype(np.int64) + 3) % 7
+
+        forbidden_time = np.zeros(len(minute_of_day), dtype=bool)
+        for start, end in cls.__peak_windows:
+            forbidden_time |= (minute_of_day >= start) & (minute_of_day <= end)
+
+        # Tabla (día de la semana, último dígito) -> restringido
+        restricted = np.frombuffer(cls.__restriction_table, dtype=bool)[weekday * 10 + last_digit]
+
+        allowed = exempt | ~forbidden_time | ~restricted
+
+        # Feriados: un único conjunto con los años de los registros que aún estarían restringidos
+        pending = ~allowed
+        years = np.unique(days[pending].astype('datetime64[Y]').astype(np.int64) + 1970)
+        holiday_days = np.array(
+            sorted(day for year in years for day in holiday_cache.holidays('EC-P', int(year))),
+            dtype='datetime64[D]')
+        allowed[pending] = np.isin(days[pending], holiday_days)
+        return allowed
+
+
+    @classmethod
+    def _rule_tables(cls):
+        """Devuelve las tablas precompiladas (restricciones 7x10, letras exentas, horas pico) para índices externos"""
+        return cls.__restriction_table, cls.__exempt_letters, cls.__peak_windows
+
+
+    @classmethod
+    def forbidden_intervals(cls, plate, start, end, online=False):
+        """
+        Calcula analíticamente los intervalos en los que el vehículo no puede circular,
+        a partir de la tabla de restricciones, las horas pico, las letras exentas y los feriados.
+        Las horas pico se evalúan por minuto, igual que predict(): 09:30 está restringido
+        hasta las 09:31.
+
+        Parámetros
+        ----------
+        plate: str
+            placa con el formato XX-YYYY o XXX-YYYY
+        start: datetime.datetime
+            inicio del rango consultado (incluido)
+        end: datetime.datetime
+            fin del rango consultado (excluido)
+        online: booleano o 'hybrid', opcional
+            si en línea == Verdadero, se usará la API de días festivos abstractos; con 'hybrid', el
+            calendario local conciliado en segundo plano (el valor predeterminado es Falso)
+        Devoluciones
+        -------
+        Una lista ordenada de tuplas (inicio, fin) de datetime.datetime, intervalos semiabiertos [inicio, fin)
+
+        aumenta
+        ------
+        ValorError
+            Si la placa no tiene el formato esperado
+        """
+        if not _PLATE_PATTERN.fullmatch(plate):
+            raise ValueError(
+                'La placa debe tener el siguiente formato: XX-YYYY o XXX-YYYY, donde X es una letra mayúscula e Y es un dígito')
+        if plate[2] == '-' or cls.__exempt_letters[ord(plate[1]) - 65] or start >= end:
+            return []
+        last_digit = ord(plate[-1]) - 48
+        intervals = []
+        day = start.date()
+        while day <= end.date():
+            if (cls.__restriction_table[day.weekday() * 10 + last_digit] and
+                    not cls.__is_holiday(day.isoformat(), online)):
+                midnight = datetime.datetime.combine(day, datetime.time(), start.tzinfo)
+                for first_minute, last_minute in cls.__peak_windows:
+                    window_start = max(start, midnight + datetime.timedelta(minutes=first_minute))
+                    window_end = min(end, midnight + datetime.timedelta(minutes=last_minute + 1))
+                    if window_start < window_end:
+                        intervals.append((window_start, window_end))
+            day += datetime.timedelta(days=1)
+        return intervals
+
+
+    @classmethod
+    def allowed_intervals(cls, plate, start, end, online=False):
+        """
+        Calcula los intervalos en los que el vehículo puede circular entre dos instantes
+        (el complemento de forbidden_intervals, con los intervalos contiguos unidos)
+
+        Parámetros
+        ----------
+        plate: str
+            placa con el formato XX-YYYY o XXX-YYYY
+        start: datetime.datetime
+            inicio del rango consultado (incluido)
+        end: datetime.datetime
+            fin del rango consultado (excluido)
+        online: booleano o 'hybrid', opcional
+            si en línea == Verdadero, se usará la API de días festivos abstractos; con 'hybrid', el
+            calendario local conciliado en segundo plano (el valor predeterminado es Falso)
+        Devoluciones
+        -------
+        Una lista ordenada de tuplas (inicio, fin) de datetime.datetime, intervalos semiabiertos [inicio, fin)
+        """
+        intervals = []
+        cursor = start
+        for window_start, window_end in cls.forbidden_intervals(plate, start, end, online):
+            if cursor < window_start:
+                intervals.append((cursor, window_start))
+            cursor = window_end
+        if cursor < end:
+            intervals.append((cursor, end))
+        return intervals
+
+
+    @classmethod
+    def next_allowed(cls, plate, from_datetime, online=False):
+        """
+        Encuentra el primer instante, desde from_datetime, en que el vehículo puede circular
+
+        Parámetros
+        ----------
+        plate: str
+            placa con el formato XX-YYYY o XXX-YYYY
+        from_datetime: datetime.datetime
+            instante desde el que se busca
+        online: booleano o 'hybrid', opcional
+            si en línea == Verdadero, se usará la API de días festivos abstractos; con 'hybrid', el
+            calendario local conciliado en segundo plano (el valor predeterminado es Falso)
+        Devoluciones
+        -------
+        Devuelve from_datetime si el vehículo puede circular en ese instante; si no, el fin
+        de la ventana de restricción que lo contiene
+        """
+        # Las ventanas de restricción no se tocan entre sí: basta con mirar el día en curso
+        forbidden = cls.forbidden_intervals(plate, from_datetime, from_datetime + datetime.timedelta(days=1), online)
+        if forbidden and forbidden[0][0] == from_datetime:
+            return forbidden[0][1]
+        return from_datetime
+
+
+class FleetIndex:
+    """
+    Un índice de flota agrupado por clase de placa (FleetIndex)
+    Las placas que comparten la misma regla efectiva forman una clase: una para todas
+    las placas exentas y una por cada último dígito. Para cada clase se precalcula un
+    mapa de bits por día (1 = restringida ese día: día laborable con el dígito
+    prohibido y que no es feriado) sobre un horizonte, de modo que saber qué vehículos
+    pueden circular en un instante cuesta una consulta al mapa de bits por clase.
+    ...
+    Atributos
+    ----------
+    start: datetime.date
+        primer día del horizonte
+    days: int
+        número de días del horizonte
+    Métodos
+    -------
+    add(self, plate):
+        Registra una placa en su clase
+    restricted_classes(self, moment):
+        Devuelve los últimos dígitos cuyas placas no pueden circular en el instante
+    allowed(self, moment):
+        Devuelve las placas que pueden circular en el instante
+    forbidden(self, moment):
+        Devuelve las placas que no pueden circular en el instante
+    counts(self, moment):
+        Devuelve (número de placas que pueden circular, número de placas que no)
+    """
+    EXEMPT = 'exempt'
+
+    def __init__(self, plates=(), start=None, days=366, online=False):
+        """
+        Construye todos los atributos necesarios para el objeto FleetIndex.
+
+        Parámetros
+        ----------
+        plates: iterable de str, opcional
+            placas de la flota con el formato XX-YYYY o XXX-YYYY
+        start: datetime.date, opcional
+            primer día del horizonte (el valor predeterminado es hoy)
+        days: int, opcional
+            número de días del horizonte (el valor predeterminado es 366)
+        online: booleano o 'hybrid', opcional
+            si en línea == Verdadero, se usará la API de días festivos abstractos; con 'hybrid', el
+            calendario local conciliado en segundo plano (el valor predeterminado es Falso)
+        """
+        if days < 1:
+            raise ValueError('El horizonte debe tener al menos un día')
+        self.start = start or datetime.date.today()
+        self.days = days
+        self._members = {self.EXEMPT: []}
+        self._members.update((digit, []) for digit in range(10))
+        self._bitmaps = self._build_bitmaps(online)
+        for plate in plates:
+            self.add(plate)
+
+    def _build_bitmaps(self, online):
+        """Precalcula, para cada último dígito, el mapa de bits de días restringidos del horizonte"""
+        restriction_table, _, _ = PicoPlaca._rule_tables()
+        bitmaps = {digit: bytearray((self.days + 7) // 8) for digit in range(10)}
+        first = self.start.toordinal()
+        for offset in range(self.days):
+            day = datetime.date.fromordinal(first + offset)
+            row = day.weekday() * 10
+            digits = [digit for digit in range(10) if restriction_table[row + digit]]
+            # El calendario de feriados solo se consulta en los días con alguna restricción
+            if not digits or self._is_holiday(day.isoformat(), online):
+                continue
+            for digit in digits:
+                bitmaps[digit][offset >> 3] |= 1 << (offset & 7)
+        return bitmaps
+
+    @staticmethod
+    def _is_holiday(date, online):
+        """Comprueba si la fecha es feriado con el mismo origen que PicoPlaca.predict()"""
+        if online == 'hybrid':
+            return hybrid_resolver().is_holiday(date)
+        if online:
+            return online_backend().is_holiday_blocking(date)
+        return holiday_cache.is_holiday(date, prov='EC-P')
+
+    def add(self, plate):
+        """
+        Registra una placa en su clase
+
+        Parámetros
+        ----------
+        plate: str
+            placa con el formato XX-YYYY o XXX-YYYY
+
+        aumenta
+        ------
+        ValorError
+            Si la placa no tiene el formato esperado
+        """
+        if not _PLATE_PATTERN.fullmatch(plate):
+            raise ValueError(
+                'La placa debe tener el siguiente formato: XX-YYYY o XXX-YYYY, donde X es una letra mayúscula e Y es un dígito')
+        _, exempt_letters, _ = PicoPlaca._rule_tables()
+        if plate[2] == '-' or exempt_letters[ord(plate[1]) - 65]:
+            self._members[self.EXEMPT].append(plate)
+        else:
+            self._members[ord(plate[-1]) - 48].append(plate)
+
+    def restricted_classes(self, moment):
+        """
+        Devuelve los últimos dígitos cuyas placas no pueden circular en el instante
+
+        Parámetros
+        ----------
+        moment: datetime.datetime
+            instante consultado; debe caer dentro del horizonte
+        Devoluciones
+        -------
+        Una lista de dígitos (la clase exenta nunca está restringida)
+
+        aumenta
+        ------
+        ValorError
+            Si el instante está fuera del horizonte del índice
+        """
+        offset = moment.date().toordinal() - self.start.toordinal()
+        if not 0 <= offset < self.days:
+            raise ValueError('El instante {} está fuera del horizonte del índice'.format(moment))
+        _, _, peak_windows = PicoPlaca._rule_tables()
+        minute = moment.hour * 60 + moment.minute
+        if not any(first <= minute <= last for first, last in peak_windows):
+            return []
+        return [digit for digit, bitmap in self._bitmaps.items() if bitmap[offset >> 3] >> (offset & 7) & 1]
+
+    def allowed(self, moment):
+        """Devuelve la lista de placas que pueden circular en el instante"""
+        restricted = set(self.restricted_classes(moment))
+        return [plate for key, plates in self._members.items() if key not in restricted for plate in plates]
+
+    def forbidden(self, moment):
+        """Devuelve la lista de placas que no pueden circular en el instante"""
+        return [plate for digit in self.restricted_classes(moment) for plate in self._members[digit]]
+
+    def counts(self, moment):
+        """Devuelve una tupla (número de placas que pueden circular, número de placas que no)"""
+        forbidden = sum(len(self._members[digit]) for digit in self.restricted_classes(moment))
+        return sum(len(plates) for plates in self._members.values()) - forbidden, forbidden
+
+
+# Línea de entrada que no se pudo interpretar; _predict_chunk la convierte en un veredicto con error
+_MalformedRecord = namedtuple('_MalformedRecord', ('plate', 'date', 'time', 'error'))
+
+
+def read_records(stream, fmt='csv'):
+    """
+    Lee registros placa/fecha/hora de un flujo de texto, uno a la vez (generador)
+    Una línea JSONL que no es un objeto JSON no detiene la lectura: se genera un
+    _MalformedRecord que se reporta como un veredicto con error.
+
+    Parámetros
+    ----------
+    stream: archivo de texto
+        flujo con los registros; en CSV debe tener la cabecera plate,date,time
+    fmt: str, opcional
+        'csv' o 'jsonl' (el valor predeterminado es 'csv')
+    Devoluciones
+    -------
+    Genera tuplas (plate, date, time) de cadenas, o _MalformedRecord para las líneas inválidas
+    """
+    if fmt == 'csv':
+        for row in csv.DictReader(stream):
+            yield row.get('plate') or '', row.get('date') or '', row.get('time') or ''
+    elif fmt == 'jsonl':
+        for number, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as error:
+                yield _MalformedRecord('', '', '', 'Línea {}: JSON no válido ({})'.format(number, error))
+                continue
+            if not isinstance(record, dict):
+                yield _MalformedRecord('', '', '', 'Línea {}: se esperaba un objeto JSON'.format(number))
+                continue
+            yield record.get('plate', ''), record.get('date', ''), record.get('time', '')
+    else:
+        raise ValueError('Formato no soportado: {} (use csv o jsonl)'.format(fmt))
+
+
+def _predict_chunk(chunk, online=False):
+    """
+    Evalúa un bloque de registros placa/fecha/hora y devuelve un veredicto por registro
+
+    Fuera de línea el bloque se evalúa con PicoPlaca.predict_batch; si contiene algún
+    registro inválido o alguna línea ilegible (_MalformedRecord), se valida registro por
+    registro para reportar el error solo en los registros afectados y los registros
+    válidos se vuelven a evaluar juntos con predict_batch. Así, en el servidor, la
+    consulta inválida de un cliente no pasa a los demás a la evaluación por registro.
+
+    Parámetros
+    ----------
+    chunk: lista de tuplas (plate, date, time)
+        registros a evaluar
+    online: booleano o 'hybrid', opcional
+        si en línea == Verdadero, se usará la API de días festivos abstractos; con 'hybrid', el
+        calendario local conciliado en segundo plano (el valor predeterminado es Falso)
+    Devoluciones
+    -------
+    Una lista de tuplas (plate, date, time, allowed, error), donde allowed es True/False,
+    o None si el registro es inválido y error contiene el mensaje
+    """
+    malformed = any(isinstance(record, _MalformedRecord) for record in chunk)
+    if not online and not malformed:
+        try:
+            verdicts = PicoPlaca.predict_batch(*zip(*chunk))
+        except (ValueError, TypeError):
+            pass
+        else:
+            return [(plate, date, hour, bool(allowed), None)
+                    for (plate, date, hour), allowed in zip(chunk, verdicts)]
+    results = [None] * len(chunk)
+    valid = []
+    for index, record in enumerate(chunk):
+        if isinstance(record, _MalformedRecord):
+            results[index] = (record.plate, record.date, record.time, None, record.error)
+        elif (online or not all(isinstance(value, str) for value in record) or
+                not (_PLATE_PATTERN.fullmatch(record[0]) and _DATE_PATTERN.fullmatch(record[1]) and
+                     _TIME_PATTERN.fullmatch(record[2]))):
+            # En línea, o si el formato no coincide, el registro se evalúa solo
+            results[index] = _predict_record(*record, online)
+        else:
+            valid.append(index)
+    if valid:
+        try:
+            verdicts = PicoPlaca.predict_batch(*zip(*(chunk[index] for index in valid)))
+        except (ValueError, TypeError):
+            # Alguna fecha con el formato correcto no existe (por ejemplo, 2021-02-30)
+            for index in valid:
+                results[index] = _predict_record(*chunk[index])
+        else:
+            for index, allowed in zip(valid, verdicts):
+                plate, date, hour = chunk[index]
+                results[index] = (plate, date, hour, bool(allowed), None)
+    return results
+
+
+def _predict_record(plate, date, hour, online=False):
+    """Evalúa un registro con PicoPlaca.predict() y devuelve (plate, date, time, allowed, error)"""
+    try:
+        return plate, date, hour, PicoPlaca(plate, date, hour, online).predict(), None
+    except (ValueError, TypeError) as error:
+        return plate, date, hour, None, str(error)
+
+
+def _chunks(records, chunk_size):
+    """Agrupa un iterable en listas de hasta chunk_size elementos (generador)"""
+    records = iter(records)
+    while True:
+        chunk = list(itertools.islice(records, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def predict_records(records, online=False, chunk_size=4096, workers=1):
+    """
+    Evalúa registros placa/fecha/hora por bloques y genera un veredicto por registro
+
+    Parámetros
+    ----------
+    records: iterable de tuplas (plate, date, time)
+        registros a evaluar
+    online: booleano o 'hybrid', opcional
+        si en línea == Verdadero, se usará la API de días festivos abstractos; con 'hybrid', el
+        calendario local conciliado en segundo plano (el valor predeterminado es Falso)
+    chunk_size: int, opcional
+        número de registros por bloque (el valor predeterminado es 4096)
+    workers: int, opcional
+        número de procesos; con más de uno los bloques se evalúan en un
+        ProcessPoolExecutor manteniendo el orden de entrada (el valor predeterminado es 1).
+        En línea (online True o 'hybrid') se ignora: cada proceso tendría su propio cliente
+        y su propio límite de solicitudes, y juntos superarían el límite de la API
+    Devoluciones
+    -------
+    Genera tuplas (plate, date, time, allowed, error), donde allowed es True/False,
+    o None si el registro es inválido y error contiene el mensaje
+    """
+    chunks = _chunks(records, chunk_size)
+    if workers <= 1 or online:
+        for chunk in chunks:
+            yield from _predict_chunk(chunk, online)
+        return
+    import concurrent.futures
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        # Como mucho dos bloques pendientes por proceso: la memoria no depende del tamaño de la entrada
+        pending = []
+        for chunk in chunks:
+            pending.append(executor.submit(_predict_chunk, chunk, online))
+            if len(pending) >= 2 * workers:
+                yield from pending.pop(0).result()
+        for future in pending:
+            yield from future.result()
+
+
+def _predict_batch_slice(plates, dates, times):
+    """Evalúa un bloque con PicoPlaca.predict_batch dentro de un proceso del pool"""
+    return PicoPlaca.predict_batch(plates, dates, times)
+
+
+def predict_parallel(plates, dates, times, workers=None, chunk_size=65536):
+    """
+    Evalúa un lote grande repartiendo bloques entre varios procesos (ProcessPoolExecutor)
+
+    Cada proceso construye el calendario de feriados de cada año una sola vez
+    (holiday_cache) y lo reutiliza en los bloques siguientes.
+
+    Parámetros
+    ----------
+    plates, dates, times: secuencias de str
+        placas (XX-YYYY o XXX-YYYY), fechas (AAAA-MM-DD) y horas (HH:MM)
+    workers: int, opcional
+        número de procesos (el valor predeterminado es os.cpu_count())
+    chunk_size: int, opcional
+        número de registros por bloque (el valor predeterminado es 65536)
+    Devoluciones
+    -------
+    Un arreglo booleano de NumPy en el orden de entrada: True si el vehículo puede estar en la carretera
+    """
+    import concurrent.futures
+    import numpy as np
+
+    if not len(plates) == len(dates) == len(times):
+        raise ValueError('Las placas, fechas y horas deben ser secuencias de la misma longitud')
+    if chunk_size < 1:
+        raise ValueError('El tamaño de bloque debe ser al menos 1')
+    bounds = range(0, len(plates), chunk_size)
+    if workers == 1 or len(bounds) <= 1:
+        return PicoPlaca.predict_batch(plates, dates, times)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(
+            _predict_batch_slice,
+            (plates[i:i + chunk_size] for i in bounds),
+            (dates[i:i + chunk_size] for i in bounds),
+            (times[i:i + chunk_size] for i in bounds))
+        return np.concatenate(list(results))
+
+
+# Desfase entre datetime.date.toordinal() y los días desde 1970-01-01 de datetime64[D]
+_EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+
+def predict_columns(plates, ordinals, minutes, out=None, bitset=False, chunk_size=1 << 20):
+    """
+    Aplica las reglas de predict() sobre columnas binarias (por ejemplo numpy.memmap),
+    bloque a bloque, sin crear objetos str ni PicoPlaca por registro
+
+    Parámetros
+    ----------
+    plates: numpy.ndarray de dtype 'S8' (o bytes más angostos)
+        placas de ancho fijo (XX-YYYY se completa con un byte cero)
+    ordinals: numpy.ndarray de enteros
+        fechas como días ordinales (datetime.date.toordinal())
+    minutes: numpy.ndarray de enteros
+        horas como minuto del día (0 - 1439)
+    out: numpy.ndarray, opcional
+        destino de los veredictos: booleano de longitud n, o uint8 de longitud (n + 7) // 8
+        si bitset es True (el valor predeterminado es None: se crea en memoria)
+    bitset: bool, opcional
+        si es True los veredictos se empaquetan en bits con numpy.packbits (el valor predeterminado es False)
+    chunk_size: int, opcional
+        registros por bloque, múltiplo de 8 (el valor predeterminado es 1048576)
+    Devoluciones
+    -------
+    El arreglo out con los veredictos (True / bit 1 si el vehículo puede estar en la carretera)
+
+    aumenta
+    ------
+    ValorError
+        Si la columna de placas no es de bytes de hasta 8, las columnas tienen distinta longitud
+        o algún valor no es válido; el mensaje
+        indica el bloque en el que se encontró
+    """
+    import numpy as np
+
+    plates = np.asarray(plates)
+    if plates.dtype.kind != 'S' or plates.dtype.itemsize > 8:
+        # Convertir una columna más ancha truncaría las placas: 'ABC-12345' pasaría como 'ABC-1234'
+        raise ValueError('La columna de placas debe ser de bytes de ancho fijo de hasta 8 (dtype S8)')
+    count = len(plates)
+    if not len(ordinals) == len(minutes) == count:
+        raise ValueError('Las columnas de placas, fechas y horas deben tener la misma longitud')
+    if chunk_size < 8 or chunk_size % 8:
+        raise ValueError('El tamaño de bloque debe ser un múltiplo de 8')
+    if out is None:
+        out = np.zeros((count + 7) // 8, dtype=np.uint8) if bitset else np.empty(count, dtype=bool)
+    elif len(out) != ((count + 7) // 8 if bitset else count):
+        raise ValueError('El arreglo de salida no tiene el tamaño esperado')
+    max_ordinal = datetime.date.max.toordinal()
+    for start in range(0, count, chunk_size):
+        end = min(start + chunk_size, count)
+        plate_chunk = np.ascontiguousarray(plates[start:end], dtype='S8')
+        ordinal_chunk = np.asarray(ordinals[start:end], dtype=np.int64)
+        minute_chunk = np.asarray(minutes[start:end], dtype=np.int64)
+        if ((ordinal_chunk < 1) | (ordinal_chunk > max_ordinal)).any():
+            raise ValueError('Fecha ordinal fuera de rango en los registros {}-{}'.format(start, end - 1))
+        if ((minute_chunk < 0) | (minute_chunk > 23 * 60 + 59)).any():
+            raise ValueError('Minuto del día fuera de rango en los registros {}-{}'.format(start, end - 1))
+        try:
+            allowed = PicoPlaca._evaluate_arrays(
+                plate_chunk.view(np.uint8).reshape(-1, 8), np.char.str_len(plate_chunk),
+                (ordinal_chunk - _EPOCH_ORDINAL).astype('datetime64[D]'), minute_chunk)
+        except ValueError as error:
+            raise ValueError('{} (registros {}-{})'.format(error, start, end - 1)) from None
+        if bitset:
+            out[start // 8:(end + 7) // 8] = np.packbits(allowed)
         else:
-            ecu_holidays = HolidayEcuador(prov='EC-P')
-            return date in ecu_holidays
+            out[start:end] = allowed
+    return out
 
 
-    def predict(self):
+def predict_column_files(plates_path, ordinals_path, minutes_path, output_path, bitset=False, chunk_size=1 << 20):
+    """
+    Procesa columnas guardadas en archivos binarios mapeados en memoria y escribe los
+    veredictos directamente en otro archivo mapeado en memoria; sirve para conjuntos de
+    datos más grandes que la RAM
+
+    Parámetros
+    ----------
+    plates_path: str
+        archivo con las placas de 8 bytes (dtype 'S8')
+    ordinals_path: str
+        archivo con las fechas como días ordinales (int32 little-endian)
+    minutes_path: str
+        archivo con los minutos del día (int16 little-endian)
+    output_path: str
+        archivo de salida: un byte por registro (0/1), o un bit por registro si bitset es True
+    bitset: bool, opcional
+        si es True la salida se empaqueta en bits (el valor predeterminado es False)
+    chunk_size: int, opcional
+        registros por bloque, múltiplo de 8 (el valor predeterminado es 1048576)
+    Devoluciones
+    -------
+    Devuelve el número de registros procesados
+    """
+    import numpy as np
+
+    plates = np.memmap(plates_path, dtype='S8', mode='r')
+    ordinals = np.memmap(ordinals_path, dtype='<i4', mode='r')
+    minutes = np.memmap(minutes_path, dtype='<i2', mode='r')
+    count = len(plates)
+    size = (count + 7) // 8 if bitset else count
+    if size == 0:
+        open(output_path, 'wb').close()
+        return 0
+    out = np.memmap(output_path, dtype=np.uint8 if bitset else bool, mode='w+', shape=(size,))
+    predict_columns(plates, ordinals, minutes, out, bitset, chunk_size)
+    out.flush()
+    del out
+    return count
+
+
+class _LineBuffer:
+    """Acumula las líneas escritas para volcarlas al flujo de salida por bloques"""
+
+    def __init__(self):
+        self.lines = []
+
+    def write(self, line):
+        self.lines.append(line)
+
+
+def _verdict_record(plate, date, hour, allowed, error):
+    """Convierte un veredicto en el diccionario que se serializa como JSON"""
+    record = {'plate': plate, 'date': date, 'time': hour, 'allowed': allowed}
+    if error is not None:
+        record['error'] = error
+    return record
+
+
+def write_verdicts(verdicts, stream, fmt='csv', chunk_size=4096):
+    """
+    Escribe los veredictos en un flujo de texto, agrupando la salida por bloques
+
+    Parámetros
+    ----------
+    verdicts: iterable de tuplas (plate, date, time, allowed, error)
+        veredictos generados por predict_records
+    stream: archivo de texto
+        flujo de salida
+    fmt: str, opcional
+        'csv' o 'jsonl' (el valor predeterminado es 'csv')
+    chunk_size: int, opcional
+        número de líneas que se acumulan antes de escribir (el valor predeterminado es 4096)
+    Devoluciones
+    -------
+    Devuelve el número de veredictos escritos
+    """
+    if fmt not in ('csv', 'jsonl'):
+        raise ValueError('Formato no soportado: {} (use csv o jsonl)'.format(fmt))
+    count = 0
+    buffer = _LineBuffer()
+    writer = csv.writer(buffer, lineterminator='\n')
+    if fmt == 'csv':
+        writer.writerow(('plate', 'date', 'time', 'allowed', 'error'))
+    for plate, date, hour, allowed, error in verdicts:
+        if fmt == 'csv':
+            writer.writerow((plate, date, hour, '' if allowed is None else str(allowed).lower(), error or ''))
+        else:
+            buffer.write(json.dumps(_verdict_record(plate, date, hour, allowed, error), ensure_ascii=False) + '\n')
+        count += 1
+        if len(buffer.lines) >= chunk_size:
+            stream.write(''.join(buffer.lines))
+            buffer.lines.clear()
+    stream.write(''.join(buffer.lines))
+    stream.flush()
+    return count
+
+
+class PredictionServer:
+    """
+    Un servidor HTTP residente de predicciones de Pico y Placa (PredictionServer)
+    Mantiene en memoria los calendarios de feriados y las tablas de reglas, atiende muchas
+    conexiones concurrentes con asyncio (HTTP/1.1 con keep-alive) y agrupa en un solo
+    bloque (micro-batching) las consultas que llegan en la misma vuelta del bucle de eventos.
+    ...
+    Rutas
+    ----------
+    GET /predict?plate=...&date=...&time=...
+        consulta individual; devuelve {"plate", "date", "time", "allowed"}
+    POST /predict
+        cuerpo JSON con un objeto {"plate", "date", "time"} o una lista de ellos;
+        devuelve un veredicto o una lista de veredictos en el mismo orden
+    GET /health
+        devuelve {"status": "ok"} y los contadores de la caché de feriados
+    GET /metrics
+        devuelve metrics.snapshot() (las métricas se registran si están activadas)
+    Métodos
+    -------
+    start(self):
+        Corrutina que abre el socket y precalienta los calendarios
+    serve_forever(self):
+        Corrutina que atiende solicitudes hasta que se cierre el servidor
+    close(self):
+        Corrutina que cierra el socket
+    """
+
+    def __init__(self, host='127.0.0.1', port=8080, online=False, max_batch=4096, batch_window=0.0,
+                 warm_years=None):
         """
-        Comprueba si el vehículo con la placa especificada puede estar en la carretera en la fecha y hora proporcionada según las reglas de Pico y Placa:
-        http://www7.quito.gob.ec/mdmq_ordenanzas/Ordenanzas/ORDENANZAS%20A%C3%91OS%20ANTERIORES/ORDM-305-%20%20CIRCULACION%20VEHICULAR%20PICO%20Y%20PLACA.pdf
+        Construye todos los atributos necesarios para el objeto PredictionServer.
+
+        Parámetros
+        ----------
+        host: str, opcional
+            dirección de escucha (el valor predeterminado es '127.0.0.1')
+        port: int, opcional
+            puerto de escucha; 0 elige uno libre (el valor predeterminado es 8080)
+        online: booleano o 'hybrid', opcional
+            si en línea == Verdadero, se usará la API de días festivos abstractos; con 'hybrid', el
+            calendario local conciliado en segundo plano (el valor predeterminado es Falso)
+        max_batch: int, opcional
+            número de registros a partir del cual un bloque se evalúa sin esperar (el valor predeterminado es 4096)
+        batch_window: float, opcional
+            segundos que se esperan para agrupar consultas; 0 agrupa las que llegan en la
+            misma vuelta del bucle de eventos (el valor predeterminado es 0.0)
+        warm_years: iterable de int, opcional
+            años cuyo calendario se calcula al arrancar (el valor predeterminado es el año actual y los adyacentes)
+        """
+        self.host = host
+        self.port = port
+        self.online = online
+        self.max_batch = max_batch
+        self.batch_window = batch_window
+        self.warm_years = warm_years
+        self._server = None
+        self._pending = []
+        self._pending_records = 0
+        self._flush_handle = None
+
+    async def start(self):
+        """Precalienta los calendarios de feriados y abre el socket de escucha"""
+        import asyncio
+
+        this_year = datetime.date.today().year
+        for year in self.warm_years or (this_year - 1, this_year, this_year + 1):
+            holiday_cache.holidays('EC-P', year)
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        """Atiende solicitudes hasta que se cierre el servidor"""
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        """Cierra el socket de escucha"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def predict(self, records):
+        """
+        Encola registros para el siguiente bloque y espera sus veredictos
+
+        Parámetros
+        ----------
+        records: lista de tuplas (plate, date, time)
+            registros a evaluar
         Devoluciones
         -------
-        Devoluciones
-        Verdadero si el vehículo con
-        la placa especificada puede estar en el camino
-        en la fecha y hora especificadas, de lo contrario Falso
+        Una lista de tuplas (plate, date, time, allowed, error) en el mismo orden
         """
-        # Comprobar si la fecha es un día festivo
-        if self.__is_holiday(self.date, self.online):
-            return True
+        import asyncio
 
-        # Consultar vehículos excluidos de la restricción según la segunda letra de la placa o si se utilizan sólo dos letras
-        #https://es.wikipedia.org/wiki/Matr%C3%ADculas_automovil%C3%ADsticas_de_Ecuador
-        if self.plate[1] in 'AUZEXM' or len(self.plate.split('-')[0]) == 2:
-            return True
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((records, future))
+        self._pending_records += len(records)
+        if self._pending_records >= self.max_batch:
+            self._flush()
+        elif self._flush_handle is None:
+            if self.batch_window > 0:
+                self._flush_handle = loop.call_later(self.batch_window, self._flush)
+            else:
+                self._flush_handle = loop.call_soon(self._flush)
+        return await future
 
-        # Verifique si el tiempo proporcionado no está en las horas pico prohibidas
-        if not self.__is_forbidden_time(self.time):
-            return True
+    def _flush(self):
+        """Evalúa en un solo bloque todas las consultas encoladas y reparte los veredictos"""
+        import asyncio
 
-        day = self.__find_day(self.date)  # Encuentra el día de la semana a partir de la fecha
-        # Verifique si el último dígito de la placa no está restringido en este día en particular
-        if int(self.plate[-1]) not in self.__restrictions[day]:
-            return True
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        pending, self._pending, self._pending_records = self._pending, [], 0
+        if not pending:
+            return
+        chunk = [record for records, _ in pending for record in records]
+        if self.online:
+            # La API en línea bloquea: el bloque se evalúa en otro hilo
+            task = asyncio.ensure_future(asyncio.to_thread(_predict_chunk, chunk, self.online))
+            task.add_done_callback(lambda done: self._deliver(pending, done.exception() or done.result()))
+        else:
+            try:
+                verdicts = _predict_chunk(chunk)
+            except Exception as error:
+                verdicts = error
+            self._deliver(pending, verdicts)
 
-        return False
+    @staticmethod
+    def _deliver(pending, verdicts):
+        """Reparte los veredictos de un bloque entre las consultas que lo formaron"""
+        offset = 0
+        for records, future in pending:
+            start, offset = offset, offset + len(records)
+            # Una consulta cancelada conserva su parte del bloque para no desplazar las siguientes
+            if future.done():
+                continue
+            if isinstance(verdicts, BaseException):
+                future.set_exception(verdicts)
+            else:
+                future.set_result(verdicts[start:offset])
+
+    async def _handle_connection(self, reader, writer):
+        """Atiende las solicitudes HTTP/1.1 de una conexión mientras el cliente la mantenga abierta"""
+        import asyncio
+
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0) or 0))
+                status, payload = await self._route(request_line.decode('latin-1').split(), body)
+                data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                writer.write(
+                    'HTTP/1.1 {}\r\nContent-Type: application/json\r\nContent-Length: {}\r\n'
+                    'Connection: {}\r\n\r\n'.format(status, len(data), 'keep-alive' if keep_alive else 'close')
+                    .encode('latin-1') + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, request, body):
+        """Resuelve una solicitud y devuelve (estado HTTP, objeto JSON de respuesta)"""
+        import urllib.parse
+
+        if len(request) != 3:
+            return '400 Bad Request', {'error': 'Solicitud HTTP inválida'}
+        method, target, _ = request
+        url = urllib.parse.urlsplit(target)
+        if url.path == '/health':
+            return '200 OK', {'status': 'ok', 'cache': holiday_cache.cache_info()._asdict()}
+        if url.path == '/metrics':
+            return '200 OK', metrics.snapshot()
+        if url.path != '/predict':
+            return '404 Not Found', {'error': 'Ruta no encontrada: {}'.format(url.path)}
+        if method == 'GET':
+            query = urllib.parse.parse_qs(url.query)
+            records = [tuple(query.get(field, [''])[0] for field in ('plate', 'date', 'time'))]
+            single = True
+        elif method == 'POST':
+            try:
+                payload = json.loads(body or b'null')
+            except ValueError:
+                return '400 Bad Request', {'error': 'El cuerpo debe ser JSON'}
+            single = isinstance(payload, dict)
+            items = [payload] if single else payload
+            if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+                return '400 Bad Request', {'error': 'Se espera un objeto {"plate", "date", "time"} o una lista de ellos'}
+            records = [(item.get('plate', ''), item.get('date', ''), item.get('time', '')) for item in items]
+        else:
+            return '405 Method Not Allowed', {'error': 'Método no permitido: {}'.format(method)}
+        verdicts = [_verdict_record(*verdict) for verdict in await self.predict(records)] if records else []
+        if single:
+            return ('200 OK' if 'error' not in verdicts[0] else '422 Unprocessable Entity'), verdicts[0]
+        return '200 OK', verdicts
+
+
+def measure_startup(argv=('-p', 'PBX-1234', '-d', '2023-05-22', '-t', '10:00'), runs=5):
+    """
+    Mide el tiempo de arranque de la línea de comandos con python -X importtime
+
+    Parámetros
+    ----------
+    argv: secuencia de str, opcional
+        argumentos con los que se ejecuta este script (el valor predeterminado es una consulta fuera de línea)
+    runs: int, opcional
+        número de ejecuciones; se informa la mediana (el valor predeterminado es 5)
+    Devoluciones
+    -------
+    Un diccionario con la mediana del tiempo total (wall_ms) y de importación (import_ms)
+    en milisegundos, y los módulos de primer nivel más costosos de la última ejecución
+    """
+    import statistics
+    import subprocess
+
+    wall, imports, modules = [], [], {}
+    for _ in range(runs):
+        start = time.perf_counter()
+        completed = subprocess.run(
+            [sys.executable, '-X', 'importtime', os.path.abspath(__file__), *argv],
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True)
+        wall.append((time.perf_counter() - start) * 1000)
+        modules = {}
+        for line in completed.stderr.splitlines():
+            if not line.startswith('import time:') or 'cumulative' in line:
+                continue
+            _, cumulative, name = line[len('import time:'):].split('|')
+            # Solo los módulos de primer nivel: su tiempo acumulado incluye el de sus dependencias
+            if not name.startswith('  '):
+                modules[name.strip()] = int(cumulative) / 1000
+        imports.append(sum(modules.values()))
+    return {
+        'runs': runs,
+        'wall_ms': round(statistics.median(wall), 3),
+        'import_ms': round(statistics.median(imports), 3),
+        'modules_ms': dict(sorted(modules.items(), key=lambda item: item[1], reverse=True)[:10])}
+
+
+def generate_workload(size, seed=0, first_year=2023, last_year=2024):
+    """
+    Genera una carga sintética y reproducible de registros placa/fecha/hora
+
+    Parámetros
+    ----------
+    size: int
+        número de registros
+    seed: int, opcional
+        semilla del generador aleatorio (el valor predeterminado es 0)
+    first_year, last_year: int, opcional
+        rango de años de las fechas generadas (el valor predeterminado es 2023-2024)
+    Devoluciones
+    -------
+    Una tupla (plates, dates, times) de listas de str
+    """
+    import random
+
+    rng = random.Random(seed)
+    letters = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+    first = datetime.date(first_year, 1, 1).toordinal()
+    last = datetime.date(last_year, 12, 31).toordinal()
+    plates, dates, times = [], [], []
+    for _ in range(size):
+        plates.append('{}-{:04d}'.format(
+            ''.join(rng.choice(letters) for _ in range(rng.choice((2, 3)))), rng.randrange(10000)))
+        dates.append(datetime.date.fromordinal(rng.randint(first, last)).isoformat())
+        times.append('{:02d}:{:02d}'.format(rng.randrange(24), rng.randrange(60)))
+    return plates, dates, times
+
+
+def _time_call(function, repeat):
+    """Ejecuta function repeat veces y devuelve sus tiempos en segundos"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def _summarize(timings, operations=1):
+    """Resume una lista de tiempos (segundos) en microsegundos por operación y operaciones por segundo"""
+    import statistics
+
+    per_op = [timing / operations * 1e6 for timing in timings]
+    best = min(timings)
+    return {
+        'repeat': len(timings),
+        'operations': operations,
+        'min_us': round(min(per_op), 3),
+        'median_us': round(statistics.median(per_op), 3),
+        'mean_us': round(statistics.fmean(per_op), 3),
+        'ops_per_s': round(operations / best, 1) if best > 0 else None}
+
+
+def _start_stub_holiday_server():
+    """
+    Inicia en segundo plano un servidor HTTP local que imita la API de abstractapi
+    con los feriados de holiday_cache; devuelve (servidor, URL)
+    """
+    import http.server
+    import urllib.parse
+
+    class StubHolidayHandler(http.server.BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            query = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+            year = int(query['year'][0])
+            body = json.dumps([
+                {'name': 'Holiday', 'date': '{}/{}/{}'.format(day[5:7], day[8:10], day[0:4])}
+                for day in sorted(holiday_cache.holidays('EC-P', year))]).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), StubHolidayHandler)
+    threading.Thread(target=server.serve_forever, name='stub-holidays', daemon=True).start()
+    return server, 'http://127.0.0.1:{}/v1/'.format(server.server_address[1])
+
+
+def run_benchmarks(size=10000, repeat=5, seed=0, first_year=2023, last_year=2024, startup_runs=5):
+    """
+    Ejecuta la batería de pruebas de rendimiento sobre una carga sintética
+
+    Casos: predict() en frío (caché de feriados vacía) y en caliente, _populate por año,
+    validación de los setters, predict_batch(), arranque de la línea de comandos y la ruta
+    en línea contra un servidor local que imita la API.
+
+    Parámetros
+    ----------
+    size: int, opcional
+        número de registros de la carga sintética (el valor predeterminado es 10000)
+    repeat: int, opcional
+        repeticiones de cada caso (el valor predeterminado es 5)
+    seed: int, opcional
+        semilla de la carga sintética (el valor predeterminado es 0)
+    first_year, last_year: int, opcional
+        rango de años de la carga (el valor predeterminado es 2023-2024)
+    startup_runs: int, opcional
+        ejecuciones del caso de arranque; 0 lo omite (el valor predeterminado es 5)
+    Devoluciones
+    -------
+    Un diccionario serializable en JSON con el entorno y los resultados de cada caso
+    """
+    import platform
+
+    plates, dates, times = generate_workload(size, seed, first_year, last_year)
+    results = {}
+
+    # predict() en frío: un vehículo restringido obliga a construir el calendario del año
+    monday = datetime.date(first_year, 1, 10)
+    monday += datetime.timedelta(days=-monday.weekday() % 7)
+    cold = PicoPlaca('PBX-1231', monday.isoformat(), '08:00')
+
+    # invalidate_holidays() también borra las reglas de cada año ya calculadas (_year_rules)
+    def predict_cold():
+        invalidate_holidays()
+        cold.predict()
+    results['predict_cold'] = _summarize(_time_call(predict_cold, repeat))
+
+    vehicles = [PicoPlaca(plate, date, hour) for plate, date, hour in zip(plates, dates, times)]
+    for vehicle in vehicles:
+        vehicle.predict()
+
+    def predict_warm():
+        for vehicle in vehicles:
+            vehicle.predict()
+    results['predict_warm'] = _summarize(_time_call(predict_warm, repeat), size)
+
+    holiday_ecuador = _holiday_ecuador_class()
+    years = range(first_year, last_year + 1)
+
+    def populate():
+        invalidate_holidays()
+        for year in years:
+            holiday_ecuador(prov='EC-P', years=year)
+    results['populate_per_year'] = _summarize(_time_call(populate, repeat), len(years))
+
+    def setters():
+        for plate, date, hour in zip(plates, dates, times):
+            PicoPlaca(plate, date, hour)
+    results['setters'] = _summarize(_time_call(setters, repeat), size)
+
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        results['predict_batch'] = None
+    else:
+        results['predict_batch'] = _summarize(
+            _time_call(lambda: PicoPlaca.predict_batch(plates, dates, times), repeat), size)
+
+    if startup_runs:
+        results['cli_startup'] = measure_startup(runs=startup_runs)
+
+    server, url = _start_stub_holiday_server()
+    try:
+        def online_cold():
+            backend = OnlineHolidayBackend(api_key='benchmark', base_url=url, rate=1e6, capacity=1e6)
+            try:
+                for year in years:
+                    backend.is_holiday_blocking('{}-01-01'.format(year))
+            finally:
+                backend.close()
+        results['online_cold_per_year'] = _summarize(_time_call(online_cold, repeat), len(years))
+
+        backend = OnlineHolidayBackend(api_key='benchmark', base_url=url, rate=1e6, capacity=1e6)
+        try:
+            for year in years:
+                backend.is_holiday_blocking('{}-01-01'.format(year))
+            results['online_warm'] = _summarize(
+                _time_call(lambda: [backend.is_holiday_blocking(date) for date in dates], repeat), size)
+        finally:
+            backend.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'workload': {'size': size, 'seed': seed, 'first_year': first_year, 'last_year': last_year},
+        'results': results}
+
+
+def _compare_path(name, expected, got, plates, dates, times, seconds, max_examples=5):
+    """Compara los veredictos de una ruta con los de la referencia y resume diferencias y rendimiento"""
+    # None (sin veredicto o veredicto de otro registro) siempre es una diferencia
+    mismatches = [index for index, (want, have) in enumerate(zip(expected, got))
+                  if have is None or bool(want) != bool(have)]
+    if len(got) != len(expected):
+        mismatches.append(min(len(got), len(expected)))
+    return {
+        'path': name,
+        'records': len(expected),
+        'mismatches': len(mismatches),
+        'examples': [{'plate': plates[index], 'date': dates[index], 'time': times[index],
+                      'expected': bool(expected[index]),
+                      'got': bool(got[index]) if index < len(got) and got[index] is not None else None}
+                     for index in mismatches[:max_examples] if index < len(expected)],
+        'seconds': round(seconds, 6),
+        'records_per_s': round(len(expected) / seconds, 1) if seconds > 0 else None}
+
+
+# Reglas de la referencia de run_selfcheck, copiadas tal cual de la versión original de PicoPlaca
+_REFERENCE_DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+_REFERENCE_RESTRICTIONS = {
+    "Monday": [1, 2],
+    "Tuesday": [3, 4],
+    "Wednesday": [5, 6],
+    "Thursday": [7, 8],
+    "Friday": [9, 0],
+    "Saturday": [],
+    "Sunday": []}
+
+
+def _reference_holidays(year, prov):
+    """
+    Implementación de referencia de los feriados de un año: las reglas literales del
+    _populate original de HolidayEcuador, feriado por feriado, sin tablas, cachés ni
+    _losep_transfer. Solo se corrigen las ramas de la Batalla de Pichincha y de la
+    Fundación de Quito que restaban un timedelta a .weekday() (TypeError); la rama de
+    Guayaquil conserva la comprobación original del 1 de mayo, que da el mismo resultado
+    porque el 1 de mayo y el 9 de octubre caen siempre el mismo día de la semana.
+
+    Parámetros
+    ----------
+    year: int
+        año que se calcula
+    prov: str
+        código de provincia según ISO3166-2; solo "EC-P" agrega la Fundación de Quito
+    Devoluciones
+    -------
+    Un set de datetime.date
+    """
+    from dateutil.easter import easter
+    from dateutil.relativedelta import relativedelta as rd, FR
+
+    days = set()
+    # Año nuevo y Navidad
+    days.add(datetime.date(year, 1, 1))
+    days.add(datetime.date(year, 12, 25))
+
+    # Semana Santa
+    days.add(easter(year) + rd(weekday=FR(-1)))
+    days.add(easter(year))
+
+    # Carnaval
+    total_lent_days = 46
+    days.add(easter(year) - datetime.timedelta(days=total_lent_days+2))
+    days.add(easter(year) - datetime.timedelta(days=total_lent_days+1))
+
+    # Día del trabajo
+    if year > 2015 and datetime.date(year, 5, 1).weekday() in (5, 1):
+        days.add(datetime.date(year, 5, 1) - datetime.timedelta(days=1))
+    elif year > 2015 and datetime.date(year, 5, 1).weekday() == 6:
+        days.add(datetime.date(year, 5, 1) + datetime.timedelta(days=1))
+    elif year > 2015 and datetime.date(year, 5, 1).weekday() in (2, 3):
+        days.add(datetime.date(year, 5, 1) + rd(weekday=FR))
+    else:
+        days.add(datetime.date(year, 5, 1))
+
+    # Batalla de Pichincha (el original restaba el timedelta a .weekday())
+    if year > 2015 and datetime.date(year, 5, 24).weekday() in (5, 1):
+        days.add(datetime.date(year, 5, 24) - datetime.timedelta(days=1))
+    elif year > 2015 and datetime.date(year, 5, 24).weekday() == 6:
+        days.add(datetime.date(year, 5, 24) + datetime.timedelta(days=1))
+    elif year > 2015 and datetime.date(year, 5, 24).weekday() in (2, 3):
+        days.add(datetime.date(year, 5, 24) + rd(weekday=FR))
+    else:
+        days.add(datetime.date(year, 5, 24))
+
+    # Primer Grito de Independencia
+    if year > 2015 and datetime.date(year, 8, 10).weekday() in (5, 1):
+        days.add(datetime.date(year, 8, 10) - datetime.timedelta(days=1))
+    elif year > 2015 and datetime.date(year, 8, 10).weekday() == 6:
+        days.add(datetime.date(year, 8, 10) + datetime.timedelta(days=1))
+    elif year > 2015 and datetime.date(year, 8, 10).weekday() in (2, 3):
+        days.add(datetime.date(year, 8, 10) + rd(weekday=FR))
+    else:
+        days.add(datetime.date(year, 8, 10))
+
+    # Independencia de Guayaquil (el original comprueba el 1 de mayo en la tercera rama)
+    if year > 2015 and datetime.date(year, 10, 9).weekday() in (5, 1):
+        days.add(datetime.date(year, 10, 9) - datetime.timedelta(days=1))
+    elif year > 2015 and datetime.date(year, 10, 9).weekday() == 6:
+        days.add(datetime.date(year, 10, 9) + datetime.timedelta(days=1))
+    elif year > 2015 and datetime.date(year, 5, 1).weekday() in (2, 3):
+        days.add(datetime.date(year, 10, 9) + rd(weekday=FR))
+    else:
+        days.add(datetime.date(year, 10, 9))
+
+    # Día de Muertos e Independencia de Cuenca
+    if datetime.date(year, 11, 2).weekday() == 5 and datetime.date(year, 11, 3).weekday() == 6:
+        days.add(datetime.date(year, 11, 2) - datetime.timedelta(days=1))
+        days.add(datetime.date(year, 11, 3) + datetime.timedelta(days=1))
+    elif datetime.date(year, 11, 3).weekday() == 2:
+        days.add(datetime.date(year, 11, 2))
+        days.add(datetime.date(year, 11, 3) - datetime.timedelta(days=2))
+    elif datetime.date(year, 11, 3).weekday() == 3:
+        days.add(datetime.date(year, 11, 3))
+        days.add(datetime.date(year, 11, 2) + datetime.timedelta(days=2))
+    elif datetime.date(year, 11, 3).weekday() == 5:
+        days.add(datetime.date(year, 11, 2))
+        days.add(datetime.date(year, 11, 3) - datetime.timedelta(days=2))
+    elif datetime.date(year, 11, 3).weekday() == 0:
+        days.add(datetime.date(year, 11, 3))
+        days.add(datetime.date(year, 11, 2) + datetime.timedelta(days=2))
+    else:
+        days.add(datetime.date(year, 11, 2))
+        days.add(datetime.date(year, 11, 3))
+
+    # Fundación de Quito, solo para Pichincha (el original sumaba el timedelta a .weekday())
+    if prov == "EC-P":
+        if year > 2015 and datetime.date(year, 12, 6).weekday() in (5, 1):
+            days.add(datetime.date(year, 12, 6) - datetime.timedelta(days=1))
+        elif year > 2015 and datetime.date(year, 12, 6).weekday() == 6:
+            days.add(datetime.date(year, 12, 6) + datetime.timedelta(days=1))
+        elif year > 2015 and datetime.date(year, 12, 6).weekday() in (2, 3):
+            days.add(datetime.date(year, 12, 6) + rd(weekday=FR))
+        else:
+            days.add(datetime.date(year, 12, 6))
+    return days
+
+
+def _reference_predict(plate, date, hour, calendars):
+    """
+    Implementación de referencia de PicoPlaca.predict(): el algoritmo original, con
+    strptime, el diccionario de restricciones y el feriado comprobado primero
+
+    Parámetros
+    ----------
+    plate, date, hour: str
+        registro ya validado
+    calendars: dict
+        memoria {año: set de feriados de Pichincha} que comparte toda la carga
+    Devoluciones
+    -------
+    Verdadero si el vehículo puede estar en el camino, de lo contrario Falso
+    """
+    day = datetime.datetime.strptime(date, '%Y-%m-%d').date()
+    if day.year not in calendars:
+        calendars[day.year] = _reference_holidays(day.year, "EC-P")
+    # Comprobar si la fecha es un día festivo
+    if day in calendars[day.year]:
+        return True
+    # Vehículos excluidos según la segunda letra de la placa o si se utilizan sólo dos letras
+    if plate[1] in 'AUZEXM' or len(plate.split('-')[0]) == 2:
+        return True
+    # Horas pico: 07:00 - 09:30 y 16:00 - 19:30
+    t = datetime.datetime.strptime(hour, '%H:%M').time()
+    if not ((t >= datetime.time(7, 0) and t <= datetime.time(9, 30)) or
+            (t >= datetime.time(16, 0) and t <= datetime.time(19, 30))):
+        return True
+    weekday = _REFERENCE_DAYS[datetime.datetime.strptime(date, '%Y-%m-%d').weekday()]
+    if int(plate[-1]) not in _REFERENCE_RESTRICTIONS[weekday]:
+        return True
+    return False
+
+
+def _check_calendars(first_year, last_year):
+    """
+    Compara, año por año, los calendarios de HolidayEcuador (HolidayBase), holiday_cache y
+    una HolidaySnapshot del mismo rango con _reference_holidays: Pichincha completo y los
+    feriados nacionales. En las demás provincias, cuyos feriados locales no existen en la
+    referencia, se comparan los días que no son feriados locales de esa provincia.
+    """
+    holiday_ecuador = _holiday_ecuador_class()
+    provinces = sorted(_HolidayEcuadorRules.PROVINCES)
+    start = time.perf_counter()
+    snapshot = HolidaySnapshot.build(first_year, last_year, provinces)
+    cache = HolidayCalendarCache(maxsize=2 * len(provinces) + 2)
+    mismatches = []
+
+    def compare(prov, year, source, reference, calendar):
+        if calendar != reference:
+            mismatches.append({'prov': prov, 'year': year, 'source': source,
+                               'missing': sorted(reference - calendar), 'extra': sorted(calendar - reference)})
+
+    for year in range(first_year, last_year + 1):
+        national = frozenset(day.isoformat() for day in _reference_holidays(year, None))
+        pichincha = frozenset(day.isoformat() for day in _reference_holidays(year, "EC-P"))
+        compare(None, year, 'holiday_cache', national, cache.national(year))
+        compare(None, year, 'snapshot', national, snapshot.national_holidays(year))
+        for prov in provinces:
+            try:
+                calendars = (
+                    ('HolidayEcuador', frozenset(day.isoformat() for day in holiday_ecuador(prov=prov, years=year))),
+                    ('holiday_cache', cache.holidays(prov, year)),
+                    ('snapshot', snapshot.holidays(prov, year)))
+            except Exception as error:
+                mismatches.append({'prov': prov, 'year': year, 'error': '{}: {}'.format(type(error).__name__, error)})
+                continue
+            for source, calendar in calendars:
+                if prov == "EC-P":
+                    compare(prov, year, source, pichincha, calendar)
+                else:
+                    local = cache.provincial(prov, year)
+                    compare(prov, year, source, national - local, calendar - local)
+    return {
+        'path': 'calendar',
+        'years': last_year - first_year + 1,
+        'provinces': provinces,
+        'mismatches': len(mismatches),
+        'examples': mismatches[:5],
+        'seconds': round(time.perf_counter() - start, 6)}
+
+
+async def _predict_with_cancelled_neighbours(server, records, size=256):
+    """
+    Envía los registros al servidor por tramos; antes de cada tramo encola una consulta
+    señuelo que se cancela antes de que se evalúe el bloque, y devuelve los veredictos de
+    los tramos (plate, date, time, allowed, error)
+    """
+    import asyncio
+
+    verdicts = []
+    for start in range(0, len(records), size):
+        part = records[start:start + size]
+        decoy = asyncio.ensure_future(server.predict(part[:2]))
+        request = asyncio.ensure_future(server.predict(part))
+        # Ambas consultas quedan encoladas en el mismo bloque y la primera se cancela antes del _flush
+        await asyncio.sleep(0)
+        decoy.cancel()
+        verdicts.extend(await request)
+    return verdicts
+
+
+def _serve_in_thread(records, cancelled=False):
+    """
+    Levanta un PredictionServer en un hilo y devuelve los veredictos de los registros:
+    por POST /predict o, si cancelled es True, con consultas vecinas canceladas en cada bloque
+    """
+    import asyncio
+    import urllib.request
+
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, name='selfcheck-server', daemon=True)
+    thread.start()
+    server = PredictionServer(port=0)
+    try:
+        asyncio.run_coroutine_threadsafe(server.start(), loop).result()
+        serving = asyncio.run_coroutine_threadsafe(server.serve_forever(), loop)
+        url = 'http://{}:{}/predict'.format(server.host, server.port)
+        if cancelled:
+            answered = asyncio.run_coroutine_threadsafe(
+                _predict_with_cancelled_neighbours(server, records), loop).result()
+            # El veredicto de otro registro (bloque desalineado) se devuelve como None: cuenta como diferencia
+            verdicts = [allowed if (plate, date, hour) == record else None
+                        for record, (plate, date, hour, allowed, _) in zip(records, answered)]
+        else:
+            verdicts = []
+            for start in range(0, len(records), 4096):
+                body = json.dumps([{'plate': plate, 'date': date, 'time': hour}
+                                   for plate, date, hour in records[start:start + 4096]]).encode('utf-8')
+                request = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json'})
+                with urllib.request.urlopen(request, timeout=60) as response:
+                    verdicts.extend(verdict['allowed'] for verdict in json.load(response))
+        serving.cancel()
+        asyncio.run_coroutine_threadsafe(server.close(), loop).result()
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+    return verdicts
+
+
+def run_selfcheck(size=20000, seed=0, first_year=2000, last_year=2100, workers=2, server=True):
+    """
+    Arnés diferencial de corrección: compara cada ruta con una implementación de referencia
+
+    La referencia (_reference_predict y _reference_holidays) es el algoritmo original
+    escrito de nuevo de forma independiente del resto del módulo, evaluado registro por
+    registro sobre una carga aleatoria (generate_workload) entre first_year y last_year.
+    Se comparan con ella PicoPlaca.predict(), predict_batch(), predict_parallel(),
+    predict_columns(), predict_records() (en bloque y en paralelo),
+    forbidden_intervals()/next_allowed(), FleetIndex y PredictionServer; además se
+    comprueban propiedades de las reglas sobre predict() (placas exentas, horas valle y
+    fines de semana siempre pueden circular) y se comparan, para cada año, los calendarios
+    de HolidayEcuador, holiday_cache y HolidaySnapshot con los de la referencia.
+
+    Parámetros
+    ----------
+    size: int, opcional
+        número de registros de la carga (el valor predeterminado es 20000)
+    seed: int, opcional
+        semilla de la carga (el valor predeterminado es 0)
+    first_year, last_year: int, opcional
+        rango de años de la carga y de los calendarios (el valor predeterminado es 2000-2100)
+    workers: int, opcional
+        procesos de las rutas paralelas (el valor predeterminado es 2)
+    server: bool, opcional
+        si es False se omite la ruta del servidor HTTP (el valor predeterminado es True)
+    Devoluciones
+    -------
+    Un diccionario serializable en JSON con la referencia, el resultado de cada ruta
+    (diferencias, ejemplos y registros por segundo) y 'ok' == True si ninguna ruta difiere
+    """
+    plates, dates, times = generate_workload(size, seed, first_year, last_year)
+    records = list(zip(plates, dates, times))
+    checks = [_check_calendars(first_year, last_year)]
+
+    start = time.perf_counter()
+    calendars = {}
+    expected = [_reference_predict(plate, date, hour, calendars) for plate, date, hour in records]
+    reference_seconds = time.perf_counter() - start
+    reference = {'path': 'reference', 'records': size, 'seconds': round(reference_seconds, 6),
+                 'records_per_s': round(size / reference_seconds, 1) if reference_seconds > 0 else None}
+
+    def check(name, function):
+        start = time.perf_counter()
+        got = list(function())
+        checks.append(_compare_path(name, expected, got, plates, dates, times, time.perf_counter() - start))
+        return got
+
+    scalar = check('predict', lambda: [PicoPlaca(plate, date, hour).predict() for plate, date, hour in records])
+
+    # Propiedades de las reglas sobre predict(): placas exentas, horas valle y fines de semana siempre pueden circular
+    def always_allowed(plate, date, hour):
+        minute = int(hour[:2]) * 60 + int(hour[3:])
+        return (plate[2] == '-' or plate[1] in 'AUZEXM' or
+                not (7 * 60 <= minute <= 9 * 60 + 30 or 16 * 60 <= minute <= 19 * 60 + 30) or
+                datetime.date.fromisoformat(date).weekday() >= 5)
+    start = time.perf_counter()
+    checks.append(_compare_path(
+        'properties', [verdict or always_allowed(*record) for record, verdict in zip(records, scalar)], scalar,
+        plates, dates, times, time.perf_counter() - start))
+
+    try:
+        import numpy as np
+    except ImportError:
+        np = None
+    if np is not None:
+        check('predict_batch', lambda: PicoPlaca.predict_batch(plates, dates, times))
+        check('predict_parallel', lambda: predict_parallel(plates, dates, times, workers=workers,
+                                                           chunk_size=max(1, size // (2 * workers))))
+
+        def columns():
+            ordinals = np.array([datetime.date.fromisoformat(date).toordinal() for date in dates], dtype='<i4')
+            minutes = np.array([int(hour[:2]) * 60 + int(hour[3:]) for hour in times], dtype='<i2')
+            packed = predict_columns(np.array(plates, dtype='S8'), ordinals, minutes, bitset=True, chunk_size=4096)
+            return np.unpackbits(packed, count=size).astype(bool)
+        check('predict_columns', columns)
+
+    check('predict_records', lambda: [verdict for _, _, _, verdict, _ in predict_records(records)])
+    check('predict_records_workers', lambda: [verdict for _, _, _, verdict, _ in
+                                              predict_records(records, chunk_size=1024, workers=workers)])
+
+    def moments():
+        return [datetime.datetime.fromisoformat('{}T{}'.format(date, hour)) for date, hour in zip(dates, times)]
+    check('forbidden_intervals', lambda: [
+        not PicoPlaca.forbidden_intervals(plate, moment, moment + datetime.timedelta(minutes=1))
+        for plate, moment in zip(plates, moments())])
+    check('next_allowed', lambda: [PicoPlaca.next_allowed(plate, moment) == moment
+                                   for plate, moment in zip(plates, moments())])
+
+    def fleet():
+        first_day = datetime.date(first_year, 1, 1)
+        index = FleetIndex(plates, start=first_day,
+                           days=datetime.date(last_year, 12, 31).toordinal() - first_day.toordinal() + 1)
+        exempt = set(index._members[index.EXEMPT])
+        return [plate in exempt or ord(plate[-1]) - 48 not in index.restricted_classes(moment)
+                for plate, moment in zip(plates, moments())]
+    check('fleet_index', fleet)
+
+    if server:
+        check('prediction_server', lambda: _serve_in_thread(records))
+        check('prediction_server_cancelled', lambda: _serve_in_thread(records, cancelled=True))
+
+    return {
+        'python': sys.version.split()[0],
+        'workload': {'size': size, 'seed': seed, 'first_year': first_year, 'last_year': last_year},
+        'reference': reference,
+        'checks': checks,
+        'ok': not any(result['mismatches'] for result in checks)}
 
 
 if __name__ == '__main__':
@@ -448,23 +3383,179 @@ if __name__ == '__main__':
         '--online',
         action='store_true',
         help='use abstract\'s Public Holidays API')
+    parser.add_argument(
+        '--hybrid',
+        action='store_true',
+        help='answer from the local holiday calendar and reconcile it with abstract\'s API in the background')
     parser.add_argument(
         '-p',
         '--plate',
-        required=True,
         help='the vehicle\'s plate: XXX-YYYY or XX-YYYY, where X is a capital letter and Y is a digit')
     parser.add_argument(
         '-d',
         '--date',
-        required=True,
         help='the date to be checked: YYYY-MM-DD')
     parser.add_argument(
         '-t',
         '--time',
-        required=True,
         help='the time to be checked: HH:MM')
+    parser.add_argument(
+        '-i',
+        '--input',
+        help='bulk mode: CSV (plate,date,time header) or JSONL file with the records to check, - for stdin')
+    parser.add_argument(
+        '--output',
+        default='-',
+        help='bulk mode: file where the verdicts are written, - for stdout (default)')
+    parser.add_argument(
+        '-f',
+        '--format',
+        choices=('csv', 'jsonl'),
+        help='bulk mode: input and output format (default: guessed from the input file extension, csv for stdin)')
+    parser.add_argument(
+        '-w',
+        '--workers',
+        type=int,
+        default=1,
+        help='bulk mode: number of worker processes used to score the records (default: 1)')
+    parser.add_argument(
+        '--columns',
+        nargs=3,
+        metavar=('PLATES', 'ORDINALS', 'MINUTES'),
+        help='columnar mode: memory-mapped binary columns (S8 plates, int32 date ordinals, int16 minute of day); '
+             'the verdicts are written to --output')
+    parser.add_argument(
+        '--bitset',
+        action='store_true',
+        help='with --columns: write one bit per record instead of one byte')
+    parser.add_argument(
+        '--snapshot',
+        help='precomputed holiday snapshot (see --build-snapshot) used instead of computing the calendar')
+    parser.add_argument(
+        '--build-snapshot',
+        metavar='FILE',
+        help='precompute the holidays of --years for every supported province and save them to FILE')
+    parser.add_argument(
+        '--years',
+        default='2000:2100',
+        help='year range for --build-snapshot: START:END (default: 2000:2100)')
+    parser.add_argument(
+        '--startup-benchmark',
+        action='store_true',
+        help='measure the start-up and import time of an offline check with -X importtime and print it as JSON')
+    parser.add_argument(
+        '--max-startup-ms',
+        type=float,
+        help='with --startup-benchmark: exit with status 1 if the median wall time exceeds this value')
+    parser.add_argument(
+        '--benchmark',
+        action='store_true',
+        help='run the benchmark suite on a synthetic workload and print the results as JSON')
+    parser.add_argument(
+        '--benchmark-size',
+        type=int,
+        default=10000,
+        help='with --benchmark: number of synthetic plate/date/time records (default: 10000)')
+    parser.add_argument(
+        '--benchmark-output',
+        default='-',
+        help='with --benchmark: file where the JSON results are written, - for stdout (default)')
+    parser.add_argument(
+        '--selfcheck',
+        action='store_true',
+        help='compare every optimized prediction path with the scalar predict() on a random 2000-2100 workload, '
+             'print the mismatches and throughput as JSON and exit with status 1 if any path differs')
+    parser.add_argument(
+        '--selfcheck-size',
+        type=int,
+        default=20000,
+        help='with --selfcheck: number of random plate/date/time records (default: 20000)')
+    parser.add_argument(
+        '--serve',
+        action='store_true',
+        help='run a resident HTTP prediction service (GET/POST /predict) with warm caches')
+    parser.add_argument(
+        '--host',
+        default='127.0.0.1',
+        help='with --serve: address to listen on (default: 127.0.0.1)')
+    parser.add_argument(
+        '--port',
+        type=int,
+        default=8080,
+        help='with --serve: port to listen on (default: 8080)')
+    parser.add_argument(
+        '--metrics',
+        choices=('json', 'prometheus'),
+        help='record prediction metrics and print them to stderr on exit in the given format')
     args = parser.parse_args()
+    if args.hybrid:
+        args.online = 'hybrid'
+
+    if args.metrics is not None:
+        import atexit
+
+        metrics.enable()
+        atexit.register(lambda: sys.stderr.write(
+            metrics.to_prometheus() if args.metrics == 'prometheus' else json.dumps(metrics.snapshot(), indent=2) + '\n'))
+
+    if args.serve:
+        import asyncio
+
+        server = PredictionServer(args.host, args.port, args.online)
+        try:
+            asyncio.run(server.serve_forever())
+        except KeyboardInterrupt:
+            pass
+        sys.exit(0)
+
+    if args.benchmark:
+        report = json.dumps(run_benchmarks(size=args.benchmark_size), indent=2)
+        if args.benchmark_output == '-':
+            print(report)
+        else:
+            with open(args.benchmark_output, 'w', encoding='utf-8') as report_file:
+                report_file.write(report + '\n')
+        sys.exit(0)
+
+    if args.selfcheck:
+        report = run_selfcheck(size=args.selfcheck_size, workers=max(2, args.workers))
+        print(json.dumps(report, indent=2))
+        sys.exit(0 if report['ok'] else 1)
+
+    if args.startup_benchmark:
+        result = measure_startup()
+        print(json.dumps(result, indent=2))
+        sys.exit(1 if args.max_startup_ms is not None and result['wall_ms'] > args.max_startup_ms else 0)
+
+    if args.build_snapshot is not None:
+        first_year, _, last_year = args.years.partition(':')
+        HolidaySnapshot.build(int(first_year), int(last_year or first_year)).save(args.build_snapshot)
+        sys.exit(0)
+
+    if args.snapshot is not None:
+        holiday_cache.snapshot = HolidaySnapshot.load(args.snapshot)
+
+    if args.columns is not None:
+        if args.output == '-':
+            parser.error('--columns requires --output FILE')
+        predict_column_files(*args.columns, args.output, bitset=args.bitset)
+        sys.exit(0)
+
+    if args.input is not None:
+        fmt = args.format or ('jsonl' if args.input.endswith(('.jsonl', '.json')) else 'csv')
+        source = sys.stdin if args.input == '-' else open(args.input, newline='', encoding='utf-8')
+        sink = sys.stdout if args.output == '-' else open(args.output, 'w', newline='', encoding='utf-8')
+        try:
+            write_verdicts(predict_records(read_records(source, fmt), args.online, workers=args.workers), sink, fmt)
+        finally:
+            if source is not sys.stdin:
+                source.close()
+            if sink is not sys.stdout:
+                sink.close()
+        sys.exit(0)
 
+    if args.plate is None or args.date is None or args.time is None:
+        parser.error('the following arguments are required: -p/--plate, -d/--date, -t/--time (or -i/--input)')
 
     pyp = PicoPlaca(args.plate, args.date, args.time, args.online)
 